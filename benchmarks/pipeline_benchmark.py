@@ -0,0 +1,154 @@
+"""Offline benchmark of the capture -> detection -> recording pipeline.
+
+Feeds synthetic (or replayed on-disk) video through CameraManager with a
+deterministic stub detector, so no webcam, network or model download is needed.
+Reports per-stage timings for each camera count and resolution, plus peak memory
+from a second run under tracemalloc so tracing does not slow the timed one, and
+writes the results as JSON for run-to-run comparison. Run from the repository root:
+
+    python -m benchmarks.pipeline_benchmark --cameras 1 2 4 --resolutions 640x480 1280x720 \\
+        --frames 200 --output bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import cv2
+import numpy as np
+from src.camera_manager import CameraManager
+from src.compositor import GridCompositor
+from src.detector import Detector, StubBackend, set_shared_detector
+from src.event_store import EventStore
+from src.recorder import Recorder
+from src.sources import SyntheticSource, ReplaySource, synthetic_detections
+from src.utilities import stitch_images
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+def make_sources(num_cameras, resolution, video=None):
+    if video is not None:
+        return [ReplaySource(video) for _ in range(num_cameras)]
+    return [SyntheticSource(*resolution, num_objects=3, seed=camera) for camera in range(num_cameras)]
+
+def start_pipeline(num_cameras, resolution, output_dir, video=None):
+    set_shared_detector(Detector(StubBackend(synthetic_detections)))
+    manager = CameraManager(make_sources(num_cameras, resolution, video))
+    events = EventStore(os.path.join(output_dir, "events.db"))
+    manager.recorders = [Recorder(output_dir, output_dir, camera_index=i, events=events) for i in range(num_cameras)]
+    return manager, events
+
+def feed_frames(manager, num_frames):
+    """Process `num_frames` rounds of frames; returns the number of rounds with a crossing."""
+    crossings = 0
+    for _ in range(num_frames):
+        _, _, crossed, _ = manager.process_feeds()
+        crossings += int(crossed)
+    return crossings
+
+def run_pipeline(num_cameras, resolution, num_frames, output_dir, video=None):
+    manager, events = start_pipeline(num_cameras, resolution, output_dir, video)
+    start = time.perf_counter()
+    crossings = feed_frames(manager, num_frames)
+    elapsed = time.perf_counter() - start
+    buffer_bytes = sum(recorder.buffer_nbytes for recorder in manager.recorders)
+    manager.release()  # Waits for clip writers so their timings are complete
+    stages = manager.get_stage_timings()
+    events.close()
+
+    # tracemalloc slows every allocation, so peak memory comes from a second, untimed run
+    manager, events = start_pipeline(num_cameras, resolution, output_dir, video)
+    tracemalloc.start()
+    feed_frames(manager, num_frames)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    manager.release()
+    events.close()
+
+    return {
+        "benchmark": "pipeline",
+        "cameras": num_cameras,
+        "resolution": f"{resolution[0]}x{resolution[1]}",
+        "frames": num_frames,
+        "seconds": round(elapsed, 3),
+        "loop_fps": round(num_frames / elapsed, 2),
+        "camera_fps": round(num_frames * num_cameras / elapsed, 2),
+        "crossings": crossings,
+        "stages": stages,
+        "memory": {
+            "traced_peak_mb": round(peak / 1e6, 2),
+            "buffer_mb": round(buffer_bytes / 1e6, 2),
+        },
+    }
+
+def run_composite(num_cameras, resolution, iterations=100):
+    frames = [SyntheticSource(*resolution, seed=camera).read()[1] for camera in range(num_cameras)]
+    annotations = [[] for _ in frames]
+    grid = GridCompositor(num_cameras)
+    timings = {}
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        grid.compose(frames, annotations)
+    timings["grid_ms"] = round((time.perf_counter() - start) / iterations * 1000, 3)
+
+    # cv2.Stitcher is far slower, so a handful of calls is enough
+    stitch_iterations = max(1, iterations // 20)
+    start = time.perf_counter()
+    for _ in range(stitch_iterations):
+        try:
+            stitch_images(frames)
+        except cv2.error:
+            pass
+    timings["stitcher_ms"] = round((time.perf_counter() - start) / stitch_iterations * 1000, 3)
+    return {"benchmark": "composite", "cameras": num_cameras,
+            "resolution": f"{resolution[0]}x{resolution[1]}", **timings}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+", default=[(640, 480), (1280, 720)])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--video", default=None, help="Replay this file on every camera instead of synthetic video")
+    parser.add_argument("--output", default=None, help="Write JSON results to this path")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for resolution in args.resolutions:
+            for num_cameras in args.cameras:
+                result = run_pipeline(num_cameras, resolution, args.frames, output_dir, args.video)
+                results.append(result)
+                print(f"pipeline  {result['resolution']:>10} x{num_cameras}: {result['camera_fps']:8.1f} camera-fps, "
+                      f"peak {result['memory']['traced_peak_mb']} MB", file=sys.stderr)
+                if num_cameras > 1:
+                    composite = run_composite(num_cameras, resolution)
+                    results.append(composite)
+                    print(f"composite {composite['resolution']:>10} x{num_cameras}: grid {composite['grid_ms']} ms, "
+                          f"stitcher {composite['stitcher_ms']} ms", file=sys.stderr)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
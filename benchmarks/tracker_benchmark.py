@@ -0,0 +1,74 @@
+"""Benchmark MultiObjectTracker and ZoneEngine with many synthetic objects per frame.
+
+Run from the repository root:
+
+    python -m benchmarks.tracker_benchmark --objects 1 10 25 50 100 --frames 500
+"""
+import argparse
+import time
+import numpy as np
+from src.tracker import MultiObjectTracker
+from src.zones import ZoneEngine, LineZone, PolygonZone
+
+def synthetic_scene(num_objects, num_frames, width=500, height=375, seed=0):
+    """Yield (N, 4) box arrays for objects bouncing around the frame, with detection jitter."""
+    rng = np.random.default_rng(seed)
+    sizes = rng.uniform(20, 60, size=(num_objects, 2))
+    positions = rng.uniform(0, 1, size=(num_objects, 2)) * [width, height]
+    velocities = rng.uniform(-4, 4, size=(num_objects, 2))
+    for _ in range(num_frames):
+        positions = positions + velocities
+        outside = (positions < 0) | (positions > [width, height])
+        velocities[outside] *= -1
+        jitter = rng.normal(0, 1.0, size=(num_objects, 2))
+        top_left = positions + jitter
+        yield np.hstack((top_left, top_left + sizes)).astype(np.float32)
+
+def make_zones(width=500, height=375):
+    """Two lines and two polygons, a typical multi-zone camera."""
+    return [
+        LineZone("middle", (0, height / 2), (width, height / 2)),
+        LineZone("diagonal", (0, 0), (width, height), directions=("in", "out")),
+        PolygonZone("left", [(20, 20), (200, 40), (180, 300), (30, 340)]),
+        PolygonZone("right", [(300, 100), (480, 100), (480, 360), (390, 250), (300, 360)]),
+    ]
+
+def run(num_objects, num_frames):
+    tracker = MultiObjectTracker()
+    zones = ZoneEngine(make_zones())
+    labels = ["Person"] * num_objects
+    frames = list(synthetic_scene(num_objects, num_frames))
+    events = 0
+    zone_time = 0.0
+    start = time.perf_counter()
+    for boxes in frames:
+        tracker.update(boxes, labels)
+        zone_start = time.perf_counter()
+        events += len(zones.update(tracker.tracks))
+        zone_time += time.perf_counter() - zone_start
+    elapsed = time.perf_counter() - start
+    return {
+        "objects": num_objects,
+        "frames": num_frames,
+        "ms_per_frame": round(elapsed / num_frames * 1000, 3),
+        "zones_us": round(zone_time / num_frames * 1e6, 1),
+        "fps": round(num_frames / elapsed, 1),
+        "tracks": len(tracker.tracks),
+        "ids_issued": tracker.next_id - 1,
+        "events": events,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, nargs="+", default=[1, 10, 25, 50, 100])
+    parser.add_argument("--frames", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'objects':>8} {'ms/frame':>10} {'zones us':>9} {'fps':>10} {'tracks':>7} {'ids':>6} {'events':>7}")
+    for num_objects in args.objects:
+        result = run(num_objects, args.frames)
+        print(f"{result['objects']:>8} {result['ms_per_frame']:>10} {result['zones_us']:>9} {result['fps']:>10} "
+              f"{result['tracks']:>7} {result['ids_issued']:>6} {result['events']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -19,4 +19,139 @@ BOUNDARY_COLOR = (255, 0, 0)  # Blue color for the boundary line
 
 # Buffer settings
 BUFFER_SECONDS = 3  # Seconds to buffer before and after crossing
-BUFFER_SIZE = int(FPS * BUFFER_SECONDS)  # Number of frames to buffer (e.g., 20 FPS * 3 seconds = 60 frames)
\ No newline at end of file
+BUFFER_SIZE = int(FPS * BUFFER_SECONDS)  # Number of frames to buffer (e.g., 20 FPS * 3 seconds = 60 frames)
+
+# Capture pipeline settings
+THREADED_CAPTURE = False  # Read each camera on its own thread and process on a worker pool
+CAPTURE_SLOT_SIZE = 2  # Frames held per camera before the oldest is dropped
+PROCESSING_WORKERS = 2  # Worker threads used to run process_frame in threaded mode
+
+# Detector settings
+DETECTOR_BACKEND = "torch_hub"  # "torch_hub", "weights" (local file) or "stub" (no detections)
+DETECTOR_REPO = "ultralytics/yolov5"  # torch.hub repo, or a local clone of it
+DETECTOR_MODEL = "yolov5s"
+DETECTOR_WEIGHTS = os.path.join(BASE_DIR, "models", "yolov5s.pt")  # Used by the "weights" backend
+DETECTOR_MAX_BATCH = 8  # Maximum frames per forward pass
+DETECTOR_BATCH_TIMEOUT = 0.005  # Seconds to wait for other cameras' frames before running a batch
+DETECTOR_INPUT_SIZE = 640  # Model input size (longest side) at full quality; adaptive levels may lower it
+
+# Motion-gated detection
+MOTION_GATING = False  # Skip detection when no contour reaches MIN_AREA
+MOTION_ROI = False  # Run detection only on the union box of moving regions
+MOTION_ROI_PADDING = 32  # Pixels added around the motion box
+DETECT_INTERVAL = 1  # While tracking, run detection every Nth frame and let the tracker carry the rest
+
+# Lens calibration
+# Per-camera calibration keyed by index in CAMERA_SOURCES: either a calibration file
+# (.npz, .yml, .yaml, .xml) or a dict with "camera_matrix", "dist_coeffs" and "image_size".
+CAMERA_CALIBRATION = {}
+DEFAULT_DIST_COEFFS = [0.1, -0.2, 0, 0]  # Used for cameras without a calibration entry
+UNDISTORT_BEFORE_DETECTION = False  # Undistort the resized frame before detection instead of at display
+BUFFER_COMPRESSED = False  # Keep pre-event frames JPEG-encoded instead of raw to save memory
+BUFFER_JPEG_QUALITY = 90
+
+# Recording writer settings
+WRITER_QUEUE_SIZE = 120  # Frames queued per active clip before new frames are dropped
+WRITER_PUT_TIMEOUT = 0.0  # Seconds the capture loop may wait on a full writer queue
+COMPRESSION_WORKERS = 1  # Processes used for AVI -> MP4 compression
+DIRECT_MP4 = False  # Encode clips straight to H.264 MP4 in COMPRESSED_DIR and skip the second pass
+MP4_FOURCC = "H264"
+
+# Multi-object tracking
+TRACK_IOU_THRESHOLD = 0.3  # Minimum IoU to associate a detection with a track
+TRACK_MAX_DISTANCE = 60  # Pixels; centroid fallback when boxes do not overlap enough
+TRACK_MAX_MISSED = 10  # Detection frames a track may go unmatched before it is dropped
+TRACK_HISTORY = 30  # Trajectory points kept per track
+
+# Multi-camera display
+STITCH_MODE = "grid"  # "grid" mosaic, "panorama" (transforms estimated once) or "stitcher" (cv2.Stitcher every frame)
+MOSAIC_COLUMNS = 0  # Grid columns; 0 picks a near-square layout
+MOSAIC_TILE_SIZE = (640, 480)  # (width, height) of each camera's tile
+
+# Metrics endpoint (/metrics in Prometheus text format, /snapshot as JSON)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = None  # Set to a port number (e.g. 9100) to enable
+
+# Multiprocess camera sharding
+SHARD_WORKERS = 0  # Worker processes that run capture and processing; 0 keeps everything in this process
+SHARD_RING_SLOTS = 4  # Shared-memory frame slots per camera
+SHARD_SLOT_BYTES = FRAME_WIDTH * FRAME_WIDTH * 3  # Initial slot size; a camera's ring grows for larger frames
+SHARD_RESULT_QUEUE = 64  # Result messages waiting for the coordinator before workers drop frames
+SHARD_RESTART_BACKOFF = 1.0  # Seconds before restarting a dead worker, doubled on each restart
+SHARD_RESTART_MAX_BACKOFF = 30.0
+SHARD_START_METHOD = "spawn"  # "spawn" or "forkserver"; "fork" would copy locks held by this process's threads
+
+# Runtime settings (changeable while running from the UI or a watched JSON file)
+DETECTION_CONFIDENCE = 0.5  # Minimum detector confidence for an object to be tracked
+DETECTION_CLASSES = ["Person", "Car", "Truck"]  # Detector labels that are tracked and can trigger recording
+RUNTIME_CONFIG_FILE = None  # JSON file with any of boundary_y, min_area, threshold, confidence, classes, post_roll_seconds
+RUNTIME_CONFIG_POLL = 1.0  # Seconds between checks of RUNTIME_CONFIG_FILE
+
+# Zones per camera index, in processed-frame coordinates (frames are resized to FRAME_WIDTH).
+# Cameras without an entry use one horizontal line at boundary_y. Example:
+# {0: [{"type": "line", "name": "gate", "points": [[0, 300], [500, 260]], "directions": ["in", "out"]},
+#      {"type": "polygon", "name": "driveway", "points": [[50, 200], [300, 200], [300, 370], [50, 370]],
+#       "trigger": False}]}
+ZONES = {}
+
+# Event index and recording browser
+EVENT_STORE_ENABLED = True  # Index every recording in an SQLite database
+EVENT_DB_PATH = os.path.join(BASE_DIR, "output", "events.db")
+EVENT_THUMBNAIL_WIDTH = 160  # Pixels; thumbnails are stored as JPEG in the database
+PLAYBACK_PREROLL_SECONDS = 1.0  # Playback starts this long before the triggering frame
+RECORDINGS_LIST_LIMIT = 200  # Events listed in the recording browser
+
+# Adaptive quality control under load
+ADAPTIVE_CONTROL = False  # Trade detection quality for throughput when processing falls behind
+ADAPTIVE_TARGET_FPS = 15.0  # Frames per second each camera should be processed at
+# Quality ladder, best first: detection input width (None = full processed frame), process every
+# `skip`-th frame, and index into DETECTOR_MODEL_TIERS
+ADAPTIVE_LEVELS = [
+    {"detect_width": None, "skip": 1, "model": 0},
+    {"detect_width": 416, "skip": 1, "model": 0},
+    {"detect_width": 320, "skip": 1, "model": 0},
+    {"detect_width": 320, "skip": 2, "model": 0},
+    {"detect_width": 320, "skip": 2, "model": 1},
+    {"detect_width": 256, "skip": 3, "model": 1},
+]
+ADAPTIVE_EWMA_ALPHA = 0.1  # Weight of the newest processing time in the moving average
+ADAPTIVE_DEGRADE_RATIO = 1.0  # Step down when the average exceeds this fraction of the frame budget
+ADAPTIVE_RESTORE_RATIO = 0.6  # Step up when the average is below this fraction of the better level's budget
+ADAPTIVE_HOLD_FRAMES = 30  # Frames a level is kept before it can change again
+ADAPTIVE_MAX_HOLD_FRAMES = 960  # Upper bound for the hold after restores that did not last
+DETECTOR_MODEL_TIERS = ["yolov5s", "yolov5n"]  # torch_hub models from most to least accurate
+RECORDER_MIN_FPS = 2.0  # Lower bound for the measured clip frame rate
+
+# Live display
+DISPLAY_FPS = 30.0  # Rate the UI redraws the live feed, independent of processing
+PROCESSING_FPS = None  # Cap on the background processing loop rate (None = as fast as possible)
+DISPLAY_SIZE = (700, 500)  # Live view canvas size in pixels (width, height)
+ALERT_DISPLAY_SECONDS = 3.0  # How long the on-screen crossing alert stays visible
+
+# Capture and reconnect. A camera source may also be a dict, e.g. {"source": "rtsp://...", "backend": "FFMPEG",
+# "buffer_size": 1}, whose keys override these defaults for that camera
+CAPTURE_BACKEND = None  # OpenCV backend name such as "FFMPEG", "GSTREAMER", "V4L2" or "DSHOW" (None = auto)
+CAPTURE_BUFFER_SIZE = None  # Frames the driver may queue; 1 keeps live streams from lagging (None = driver default)
+CAPTURE_FOURCC = None  # Pixel format requested from devices, e.g. "MJPG" (None = driver default)
+CAPTURE_RESOLUTION = None  # (width, height) requested from devices (None = driver default)
+CAPTURE_FPS = None  # Frame rate requested from devices (None = driver default)
+CAPTURE_OPEN_TIMEOUT = 5.0  # Seconds; passed to backends that support an open timeout
+CAPTURE_READ_TIMEOUT = 5.0  # Seconds without a frame before a source counts as stalled
+CAPTURE_MAX_FAILURES = 10  # Consecutive failed reads before a source is reconnected
+CAPTURE_RECONNECT_BACKOFF = 0.5  # Seconds before the first reconnect attempt, doubled after each failure
+CAPTURE_RECONNECT_MAX_BACKOFF = 30.0  # Upper bound for the reconnect delay
+
+# Recording state machine
+RECORDER_EXTEND_ON_DETECTION = True  # Objects detected during post-roll keep the clip going
+RECORDER_MAX_CLIP_SECONDS = 120.0  # A clip is closed at this length even if activity continues
+# Crossings within this many seconds after a clip's post-roll continue the same clip instead of starting a new
+# one. Limited to what the pre-event buffer holds (BUFFER_SIZE frames), so the merged clip has no gap
+RECORDER_MERGE_GAP_SECONDS = BUFFER_SECONDS
+
+# Startup
+DETECTOR_BACKGROUND_LOAD = True  # Load the model on a background thread; motion-only detection runs meanwhile
+DETECTOR_WARMUP = True  # Run one dummy inference before the model is switched in
+DETECTOR_LOAD_RETRY = 30.0  # Seconds before retrying a failed model load (e.g. offline with no hub cache)
+IDLE_POLL_INTERVAL = 0.01  # Seconds to wait before polling again when no camera delivered a frame
+IDLE_MAX_WAIT = 0.5  # Longest a processing loop sleeps while every camera is waiting to reconnect
+MOTION_STOP_HOLD = 1.0  # Seconds without motion before a camera reports motion_stopped
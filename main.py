@@ -1,9 +1,41 @@
+from src.metrics import startup_clock  # First import, so startup timings count from launch
 from src.camera_manager import CameraManager
-from src.ui import UserInterface
-from config.config import CAMERA_SOURCES, OUTPUT_DIR, COMPRESSED_DIR
+from src.metrics import MetricsServer
+from config.config import CAMERA_SOURCES, OUTPUT_DIR, COMPRESSED_DIR, THREADED_CAPTURE, METRICS_HOST, METRICS_PORT, \
+    SHARD_WORKERS, RUNTIME_CONFIG_FILE, DISPLAY_FPS, PROCESSING_FPS
+import argparse
+import logging
 import os
 
+def parse_source(value):
+    """Camera indices are given as integers; anything else is a file path or stream URL."""
+    return int(value) if value.isdigit() else value
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Smart Security Camera System")
+    parser.add_argument("--headless", action="store_true", help="Run detection and recording without the UI")
+    parser.add_argument("--sources", nargs="+", type=parse_source, default=CAMERA_SOURCES,
+                        help="Camera indices, video files or stream URLs (default: CAMERA_SOURCES)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds (headless)")
+    parser.add_argument("--max-fps", type=float, default=PROCESSING_FPS,
+                        help="Cap the processing loop rate (default: PROCESSING_FPS, uncapped if unset)")
+    parser.add_argument("--display-fps", type=float, default=DISPLAY_FPS,
+                        help="Live view redraw rate, independent of processing (UI)")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between stats lines (headless)")
+    parser.add_argument("--threaded", action="store_true", help="Use per-camera capture threads")
+    parser.add_argument("--shards", type=int, default=SHARD_WORKERS,
+                        help="Run cameras in this many worker processes (0 = in-process)")
+    parser.add_argument("--config-file", default=RUNTIME_CONFIG_FILE,
+                        help="JSON file of runtime settings, re-applied whenever it changes")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Serve Prometheus metrics on this port (default: METRICS_PORT, off if unset)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
     # Ensure output directories exist
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
@@ -11,6 +43,16 @@ if __name__ == "__main__":
         os.makedirs(COMPRESSED_DIR)
 
     # Initialize system
-    camera_manager = CameraManager(CAMERA_SOURCES)
-    ui = UserInterface(camera_manager)
-    ui.run()
\ No newline at end of file
+    camera_manager = CameraManager(args.sources, threaded=args.threaded or THREADED_CAPTURE,
+                                   shards=args.shards, config_file=args.config_file,
+                                   undistort_display=not args.headless)
+    if args.metrics_port:
+        MetricsServer(camera_manager.metrics, METRICS_HOST, args.metrics_port).start()
+    if args.headless:
+        from src.headless import HeadlessRunner
+        HeadlessRunner(camera_manager, args.duration, args.max_fps, args.stats_interval).run()
+    else:
+        # Tk and PIL are only needed for the UI
+        from src.ui import UserInterface
+        ui = UserInterface(camera_manager, args.display_fps, args.max_fps)
+        ui.run()
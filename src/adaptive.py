@@ -0,0 +1,96 @@
+import logging
+from config.config import ADAPTIVE_CONTROL, ADAPTIVE_TARGET_FPS, ADAPTIVE_LEVELS, ADAPTIVE_EWMA_ALPHA, ADAPTIVE_DEGRADE_RATIO, ADAPTIVE_RESTORE_RATIO, \
+    ADAPTIVE_HOLD_FRAMES, ADAPTIVE_MAX_HOLD_FRAMES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def frame_budget(cameras, parallelism=1):
+    """Seconds of processing each camera may spend per frame to hold ADAPTIVE_TARGET_FPS, or None when disabled.
+
+    `cameras` share `parallelism` processing lanes (workers), so each lane serves
+    cameras / parallelism frames per target frame period.
+    """
+    if not ADAPTIVE_CONTROL or cameras <= 0:
+        return None
+    return parallelism / (ADAPTIVE_TARGET_FPS * cameras)
+
+class AdaptiveController:
+    """Per-camera quality controller driven by measured processing time.
+
+    Keeps an EWMA of the seconds spent per processed frame and walks a ladder of
+    quality levels (ADAPTIVE_LEVELS, best first): each level sets the detection
+    input width, how many frames to skip and the detector model tier. It steps
+    down when the EWMA exceeds the frame budget and back up once there is clear
+    headroom. A level must be held for `hold_frames` before the next change, and
+    a restore that is quickly undone doubles that hold for the next restore.
+    """
+
+    def __init__(self, budget, levels=ADAPTIVE_LEVELS, alpha=ADAPTIVE_EWMA_ALPHA, hold_frames=ADAPTIVE_HOLD_FRAMES,
+                 camera_index=0):
+        self.budget = budget  # Seconds available per captured frame
+        self.levels = levels
+        self.alpha = alpha
+        self.hold_frames = hold_frames
+        self.restore_hold = hold_frames
+        self.camera_index = camera_index
+        self.level = 0
+        self.ewma = None
+        self.frames_at_level = 0
+        self.last_change_was_restore = False
+        self.changes = 0
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    @property
+    def skip(self):
+        return self.current.get("skip", 1)
+
+    @property
+    def detect_width(self):
+        return self.current.get("detect_width")
+
+    @property
+    def model_tier(self):
+        return self.current.get("model", 0)
+
+    def observe(self, seconds):
+        """Record the processing time of one frame; returns True if the level changed."""
+        self.ewma = seconds if self.ewma is None else self.alpha * seconds + (1 - self.alpha) * self.ewma
+        self.frames_at_level += 1
+        if self.frames_at_level < self.hold_frames:
+            return False
+
+        # Skipped frames give each processed frame `skip` frames' worth of budget
+        allowed = self.budget * self.skip
+        if self.ewma > allowed * ADAPTIVE_DEGRADE_RATIO and self.level < len(self.levels) - 1:
+            if self.last_change_was_restore and self.frames_at_level < 2 * self.restore_hold:
+                # The restored level could not keep up: wait longer before trying it again
+                self.restore_hold = min(self.restore_hold * 2, ADAPTIVE_MAX_HOLD_FRAMES)
+            self._change(self.level + 1, restore=False)
+            return True
+        if self.level > 0 and self.frames_at_level >= self.restore_hold:
+            better_allowed = self.budget * self.levels[self.level - 1].get("skip", 1)
+            if self.ewma < better_allowed * ADAPTIVE_RESTORE_RATIO:
+                self._change(self.level - 1, restore=True)
+                return True
+        if self.last_change_was_restore and self.frames_at_level >= 4 * self.restore_hold:
+            self.restore_hold = self.hold_frames  # The restore held up
+        return False
+
+    def _change(self, level, restore):
+        logging.info(f"Camera {self.camera_index}: {'restoring' if restore else 'degrading'} quality to level {level} "
+                     f"{self.levels[level]} (processing {self.ewma * 1000:.1f} ms, budget {self.budget * 1000:.1f} ms)")
+        self.level = level
+        self.frames_at_level = 0
+        self.last_change_was_restore = restore
+        self.changes += 1
+
+    def get_stats(self):
+        return {
+            "quality_level": self.level,
+            "processing_ms": round((self.ewma or 0.0) * 1000, 2),
+            "budget_ms": round(self.budget * 1000, 2),
+            "quality_changes": self.changes,
+        }
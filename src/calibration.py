@@ -0,0 +1,86 @@
+import os
+import cv2
+import numpy as np
+import logging
+from config.config import CAMERA_CALIBRATION, DEFAULT_DIST_COEFFS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class Calibration:
+    """Camera intrinsics and distortion coefficients.
+
+    `camera_matrix` is given for `image_size` (width, height) and is rescaled to
+    whatever resolution is being undistorted. Without a camera matrix the focal
+    length is taken as the frame width with the principal point at the centre.
+    """
+
+    def __init__(self, camera_matrix=None, dist_coeffs=DEFAULT_DIST_COEFFS, image_size=None):
+        self.camera_matrix = None if camera_matrix is None else np.asarray(camera_matrix, dtype=np.float64).reshape(3, 3)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).ravel()
+        self.image_size = tuple(image_size) if image_size is not None else None
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a calibration saved as .npz or as OpenCV FileStorage (.yml, .yaml, .xml, .json)."""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Calibration file not found: {path}")
+        if path.endswith(".npz"):
+            data = np.load(path)
+            image_size = data["image_size"].tolist() if "image_size" in data else None
+            return cls(data["camera_matrix"], data["dist_coeffs"], image_size)
+
+        fs = cv2.FileStorage(path, cv2.FILE_STORAGE_READ)
+        try:
+            camera_matrix = fs.getNode("camera_matrix").mat()
+            dist_coeffs = fs.getNode("dist_coeffs").mat()
+            width = fs.getNode("image_width")
+            height = fs.getNode("image_height")
+            image_size = None if width.empty() or height.empty() else (int(width.real()), int(height.real()))
+        finally:
+            fs.release()
+        if camera_matrix is None or dist_coeffs is None:
+            raise ValueError(f"Calibration file {path} needs camera_matrix and dist_coeffs")
+        return cls(camera_matrix, dist_coeffs, image_size)
+
+    @classmethod
+    def from_config(cls, entry):
+        """Build a calibration from a CAMERA_CALIBRATION entry (file path or dict)."""
+        if entry is None:
+            return cls()
+        if isinstance(entry, str):
+            return cls.from_file(entry)
+        return cls(entry.get("camera_matrix"), entry.get("dist_coeffs", DEFAULT_DIST_COEFFS), entry.get("image_size"))
+
+    def matrix_for(self, width, height):
+        if self.camera_matrix is None:
+            return np.array([[width, 0, width / 2], [0, width, height / 2], [0, 0, 1]], dtype=np.float64)
+        if self.image_size is None or self.image_size == (width, height):
+            return self.camera_matrix
+        sx, sy = width / self.image_size[0], height / self.image_size[1]
+        return np.diag([sx, sy, 1.0]) @ self.camera_matrix
+
+class Undistorter:
+    """Undistorts frames with remap tables that are built once per resolution."""
+
+    def __init__(self, calibration=None):
+        self.calibration = calibration if calibration is not None else Calibration()
+        self.maps = {}
+
+    def get_maps(self, width, height):
+        key = (width, height)
+        maps = self.maps.get(key)
+        if maps is None:
+            K = self.calibration.matrix_for(width, height)
+            maps = cv2.initUndistortRectifyMap(K, self.calibration.dist_coeffs, None, K, (width, height), cv2.CV_16SC2)
+            self.maps[key] = maps
+            logging.info(f"Built undistortion maps for {width}x{height}")
+        return maps
+
+    def undistort(self, frame):
+        h, w = frame.shape[:2]
+        map1, map2 = self.get_maps(w, h)
+        return cv2.remap(frame, map1, map2, interpolation=cv2.INTER_LINEAR)
+
+def get_undistorter(camera_index):
+    """Undistorter for a camera, using its CAMERA_CALIBRATION entry if there is one."""
+    return Undistorter(Calibration.from_config(CAMERA_CALIBRATION.get(camera_index)))
@@ -1,64 +1,348 @@
-from src.video_processor import VideoProcessor
+from src.video_processor import VideoProcessor, process_batch
 from src.recorder import Recorder
-from src.utilities import stitch_images
+from src.capture import CaptureThread
+from src.clip_writer import shutdown_compression_pool
+from src.detector import get_shared_detector
+from src.compositor import create_compositor
+from src.calibration import get_undistorter
+from src.sharding import ShardPool
+from src.runtime_config import get_runtime_config, ConfigWatcher
+from src.adaptive import frame_budget
+from src.metrics import StageTimer, Histogram, MetricsRegistry, RateLimitedLogger, merge_summaries, startup_clock
+from config.config import THREADED_CAPTURE, CAPTURE_SLOT_SIZE, PROCESSING_WORKERS, SHARD_WORKERS, RUNTIME_CONFIG_FILE, \
+    IDLE_POLL_INTERVAL, IDLE_MAX_WAIT, UNDISTORT_BEFORE_DETECTION, MOTION_STOP_HOLD
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import logging
+import numpy as np
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+IDENTITY = np.eye(3)
+
+class MotionHold:
+    """Turns one camera's per-frame motion flag into start and stop transitions.
+
+    Motion starts on the first frame that reports it and only stops after `hold`
+    seconds without any, so short gaps do not produce a stop/start pair.
+    """
+
+    def __init__(self, hold=MOTION_STOP_HOLD):
+        self.hold = hold
+        self.active = False
+        self.last_seen = None
+
+    def update(self, detected, now):
+        """Returns "motion_started", "motion_stopped" or None for a frame seen at `now`."""
+        if detected:
+            self.last_seen = now
+            if not self.active:
+                self.active = True
+                return "motion_started"
+        elif self.active and now - self.last_seen >= self.hold:
+            self.active = False
+            return "motion_stopped"
+        return None
+
 class CameraManager:
-    def __init__(self, sources):
+    def __init__(self, sources, threaded=THREADED_CAPTURE, workers=PROCESSING_WORKERS, shards=SHARD_WORKERS,
+                 config_file=RUNTIME_CONFIG_FILE, undistort_display=True):
         logging.info("Initializing CameraManager")
-        self.processors = [VideoProcessor(source) for source in sources]
-        self.recorders = [Recorder() for _ in sources]
+        self.num_cameras = len(sources)
+        # Shard workers load their own models; the coordinator does not need one
+        self.detector = get_shared_detector() if not shards else None
+        self.settings = get_runtime_config()  # Shared by every processor and recorder
+        self.config_watcher = None
+        if config_file:
+            self.config_watcher = ConfigWatcher(self.settings, config_file)
+            self.config_watcher.start()
+        self.shards = None
+        if shards:
+            # Capture and processing run in worker processes; frames come back through shared memory
+            self.processors = []
+            self.shards = ShardPool(sources, shards, self.settings)
+            threaded = False
+        else:
+            # Serial mode processes every camera in turn; threaded mode has `workers` lanes
+            budget = frame_budget(self.num_cameras, min(workers, self.num_cameras) if threaded else 1)
+            self.processors = [VideoProcessor(source, self.detector, i, self.settings, budget)
+                               for i, source in enumerate(sources)]
+        self.recorders = [Recorder(settings=self.settings, camera_index=i) for i in range(self.num_cameras)]
+        self.compositor = create_compositor(self.num_cameras)
+        # Frames are undistorted for display with each camera's own calibration before compositing,
+        # unless processing already did it (or nothing is displayed)
+        self.display_undistorters = None
+        if undistort_display and not UNDISTORT_BEFORE_DETECTION:
+            self.display_undistorters = [get_undistorter(i) for i in range(self.num_cameras)]
+        self.timer = StageTimer()  # Stages that run once per process_feeds call
+
+        self.threaded = threaded
+        self.capture_threads = []
+        self.executor = None
+        self.pending = {}  # Camera index -> in-flight Future (at most one per camera)
+        self.latest_results = [None] * self.num_cameras
+        self.processed_frames = [0] * self.num_cameras
+        self.motion = [MotionHold() for _ in range(self.num_cameras)]
+        self.events = []  # Structured events from the most recent process_feeds call
+        self.results_collected = 0  # Camera results the most recent process_feeds call took in
+        self.view_tiles = {}  # Camera index -> (camera-to-view matrix, frame size) for the latest returned frame
+        self.activity = threading.Event()  # Threaded mode: set when a frame is captured or a job finishes
+        self.started_at = time.monotonic()
+        self.log = RateLimitedLogger()
+        self.frame_age = [Histogram() for _ in range(self.num_cameras)]  # Capture -> decision latency
+        self.metrics = self._build_registry()
+        if self.threaded:
+            self.start_capture(workers)
+
+    def start_capture(self, workers=PROCESSING_WORKERS):
+        """Start one reader thread per camera and the processing worker pool."""
+        self.capture_threads = [CaptureThread(processor.cap, i, CAPTURE_SLOT_SIZE, self._frame_captured)
+                                for i, processor in enumerate(self.processors)]
+        for capture in self.capture_threads:
+            capture.start()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="process")
+        # Each worker has at most one frame in the detector's batch at a time
+        self.detector.set_callers(min(workers, self.num_cameras))
+        logging.info(f"Threaded capture enabled with {workers} processing workers")
+
+    def _frame_captured(self, i):
+        """Capture-thread callback: wake the processing loop if camera i has no job in flight."""
+        if i not in self.pending:
+            self.activity.set()
+
+    def _build_registry(self):
+        registry = MetricsRegistry()
+        registry.add_timer(self.timer, component="manager")
+        for i, processor in enumerate(self.processors):
+            registry.add_timer(processor.timer, component="processor", camera=i)
+        for i, recorder in enumerate(self.recorders):
+            registry.add_timer(recorder.timer, component="recorder", camera=i)
+            registry.add_histogram("frame_age_seconds", self.frame_age[i], camera=i)
+        registry.add_collector(self._collect_gauges)
+        return registry
+
+    def _collect_gauges(self):
+        gauges = []
+        for camera_stats in self.get_stats():
+            camera = camera_stats["camera"]
+            for key, value in camera_stats.items():
+                if key != "camera" and isinstance(value, (int, float, bool)):
+                    gauges.append((f"camera_{key}", {"camera": camera}, value))
+        if self.detector is not None:
+            for key, value in self.detector.get_stats().items():
+                if isinstance(value, (int, float, bool)):
+                    gauges.append((f"detector_{key}", {}, value))
+        for milestone, seconds in startup_clock.summary().items():
+            gauges.append(("startup_seconds", {"milestone": milestone}, seconds))
+        return gauges
+
+    def _read_serial(self):
+        items = []
+        captured = {}
+        for i, processor in enumerate(self.processors):
+            ret, frame = processor.cap.read()
+            if not ret:
+                self.log.log(f"read-{i}", logging.WARNING, f"Failed to read frame from camera {i}")
+                continue
+            if not processor.accept_frame():
+                continue
+
+            captured[i] = time.monotonic()
+            items.append((i, processor, frame))
+
+        return [result + (captured[result[0]],) for result in process_batch(self.detector, items, self.timer)]
+
+    def _process(self, i, frame, captured_at):
+        """Worker-pool job: process one frame and capture its zone events before the next job can run."""
+        processor = self.processors[i]
+        return processor.process_frame(frame) + (processor.last_events, captured_at)
+
+    def _collect_threaded(self):
+        """Collect finished results and hand the newest captured frames to idle workers."""
+        # Anything that happens from here on wakes the next wait_for_results call
+        self.activity.clear()
+        results = []
+        for i, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[i]
+            try:
+                results.append((i,) + future.result())
+            except Exception as e:
+                logging.error(f"Error processing frame from camera {i}: {e}")
+
+        for i, capture in enumerate(self.capture_threads):
+            if i in self.pending:
+                continue
+            frame, captured_at = capture.get_latest()
+            if frame is not None and self.processors[i].accept_frame():
+                self.pending[i] = self.executor.submit(self._process, i, frame, captured_at)
+                self.pending[i].add_done_callback(lambda _: self.activity.set())
+        return results
 
     def process_feeds(self):
         frames = []
         motion_detected = False
         boundary_crossed = False
         all_annotations = []
+        cameras = []
 
-        for i, processor in enumerate(self.processors):
-            ret, frame = processor.cap.read()
-            if not ret:
-                logging.warning(f"Failed to read frame from camera {i}")
-                continue
+        self.events = []
+
+        if self.shards is not None:
+            results = self.shards.collect()
+        elif self.threaded:
+            results = self._collect_threaded()
+        else:
+            results = self._read_serial()
+        decoupled = self.threaded or self.shards is not None
+        self.results_collected = len(results)
+        if decoupled and not results:
+            # Nothing new since the last call: skip compositing so callers do not republish the same mosaic
+            return None, False, False, []
 
-            logging.debug(f"Frame read from camera {i}, shape: {frame.shape}")
-            frame, detected, crossed, annotations = processor.process_frame(frame)
-            frames.append(frame)
+        for i, frame, detected, crossed, annotations, zone_events, captured_at in results:
+            self.frame_age[i].observe(time.monotonic() - captured_at)
+            self.processed_frames[i] += 1
+            display_frame = frame
+            if self.display_undistorters is not None:
+                with self.timer.stage("undistort"):
+                    display_frame = self.display_undistorters[i].undistort(frame)
+            self.latest_results[i] = (display_frame, annotations)
+            frames.append(display_frame)
             all_annotations.append(annotations)
+            cameras.append(i)
 
             # Always add the frame to the buffer
-            self.recorders[i].add_to_buffer(frame, annotations)
+            with self.timer.stage("buffer"):
+                self.recorders[i].add_to_buffer(frame, annotations)
 
             if detected:
                 motion_detected = True
-                logging.info(f"Motion detected by camera {i}")
+                self.log.log(f"motion-{i}", logging.INFO, f"Motion detected by camera {i}")
+            transition = self.motion[i].update(detected, captured_at)
+            if transition is not None:
+                self.events.append({"type": transition, "camera": i,
+                                    "labels": sorted({label for *_, label in annotations})})
+            for event in zone_events:
+                self.events.append(dict(event, camera=i))
 
             if crossed:
                 boundary_crossed = True
-                self.recorders[i].start_recording(frame)
-            elif self.recorders[i].recording:
-                self.recorders[i].record_frame(frame, annotations)
-
-        if len(frames) > 1:
-            logging.info("Stitching frames")
-            stitched_frame = stitch_images(frames)
-            # Combine annotations for stitched frame (simplified: use first camera's annotations)
-            stitched_annotations = all_annotations[0] if all_annotations else []
+            # Starts, extends, merges and ends clips; only triggering crossings start one
+            outcome = self.recorders[i].update(frame, annotations, detected, zone_events if crossed else ())
+            if outcome == "started":
+                self.events.append({"type": "recording_started", "camera": i})
+
+        if decoupled:
+            # Show the latest result from every camera, not only the ones that finished this tick
+            cameras = [i for i, result in enumerate(self.latest_results) if result is not None]
+            frames = [self.latest_results[i][0] for i in cameras]
+            all_annotations = [self.latest_results[i][1] for i in cameras]
+
+        if self.num_cameras > 1:
+            # Annotations are returned in mosaic coordinates
+            with self.timer.stage("composite"):
+                stitched_frame, stitched_annotations = self.compositor.compose(frames, all_annotations, cameras)
+            self.view_tiles = self.compositor.tiles
         else:
             stitched_frame = frames[0] if frames else None
             stitched_annotations = all_annotations[0] if all_annotations else []
+            self.view_tiles = {0: (IDENTITY, (frames[0].shape[1], frames[0].shape[0]))} if frames else {}
 
-        if stitched_frame is not None:
-            logging.debug(f"Returning stitched frame, shape: {stitched_frame.shape}")
-        else:
-            logging.warning("No frames to return")
+        if stitched_frame is None and not decoupled:
+            self.log.log("no-frames", logging.WARNING, "No frames to return")
+        elif stitched_frame is not None:
+            startup_clock.mark("first_frame")
         return stitched_frame, motion_detected, boundary_crossed, stitched_annotations
 
+    def apply_settings(self, **changes):
+        """Change runtime settings; they apply from the next frame on every camera.
+
+        Raises ValueError (and changes nothing) if a setting is unknown or invalid.
+        """
+        return self.settings.update(**changes)
+
+    def get_stats(self):
+        """Per-camera capture, processing, detection-gating and recording counters."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        stats = []
+        for i in range(self.num_cameras):
+            camera_stats = {
+                "camera": i,
+                "processed_frames": self.processed_frames[i],
+                "processed_fps": round(self.processed_frames[i] / elapsed, 2),
+            }
+            if self.threaded:
+                camera_stats.update(self.capture_threads[i].get_stats())
+                camera_stats["in_flight"] = int(i in self.pending)
+            if self.shards is not None:
+                camera_stats.update(self.shards.get_camera_stats(i))
+            else:
+                camera_stats.update(self.processors[i].get_stats())
+            camera_stats["buffer_bytes"] = self.recorders[i].buffer_nbytes
+            camera_stats.update(self.recorders[i].get_stats())
+            camera_stats["frame_age_p50_ms"] = round(self.frame_age[i].quantile(0.5) * 1000, 2)
+            camera_stats["frame_age_p99_ms"] = round(self.frame_age[i].quantile(0.99) * 1000, 2)
+            stats.append(camera_stats)
+        return stats
+
+    def wait_for_results(self, timeout=IDLE_MAX_WAIT):
+        """Wait after a process_feeds call that collected nothing, instead of spinning.
+
+        Threaded mode wakes as soon as a frame is captured or a job finishes, and
+        sharded mode as soon as a worker publishes. Serial reads return at once
+        while sources are down, so serial mode sleeps until the earliest reconnect
+        attempt (at least IDLE_POLL_INTERVAL). No wait is longer than `timeout`.
+        """
+        if self.shards is not None:
+            self.shards.wait(timeout)
+        elif self.threaded:
+            self.activity.wait(timeout)
+        else:
+            retries = [processor.cap.retry_delay() for processor in self.processors]
+            delay = max(IDLE_POLL_INTERVAL, min((retry for retry in retries if retry is not None), default=timeout))
+            time.sleep(min(delay, timeout))
+
+    def all_sources_ended(self):
+        """True when every camera has ended (e.g. all file sources played out)."""
+        return all(health["capture_state"] in ("ended", "closed") for health in self.camera_health())
+
+    def camera_health(self):
+        """Capture state per camera (see ResilientCapture.health); sharded cameras report once a second."""
+        if self.shards is not None:
+            health = []
+            for i in range(self.num_cameras):
+                stats = self.shards.get_camera_stats(i)
+                camera_health = {key: value for key, value in stats.items() if key.startswith("capture_")}
+                camera_health.setdefault("capture_state", "starting" if stats["shard_alive"] else "shard down")
+                health.append(camera_health)
+            return health
+        return [processor.cap.health() for processor in self.processors]
+
+    def get_stage_timings(self):
+        """Per-stage timings merged across the manager, every processor and every recorder."""
+        summaries = [self.timer.summary()]
+        summaries += [processor.timer.summary() for processor in self.processors]
+        if self.shards is not None:
+            summaries += self.shards.stage_summaries  # As last reported by the workers
+        summaries += [recorder.timer.summary() for recorder in self.recorders]
+        return merge_summaries(summaries)
+
     def release(self):
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+        if self.shards is not None:
+            self.shards.stop()
+        for capture in self.capture_threads:
+            capture.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
         for processor in self.processors:
             processor.release()
         for recorder in self.recorders:
-            recorder.stop_recording()
\ No newline at end of file
+            recorder.close()
+        shutdown_compression_pool(wait=True)
@@ -0,0 +1,329 @@
+import os
+import threading
+import time
+import logging
+from collections import deque
+import cv2
+from src.metrics import RateLimitedLogger
+from config.config import CAPTURE_BACKEND, CAPTURE_BUFFER_SIZE, CAPTURE_FOURCC, CAPTURE_RESOLUTION, CAPTURE_FPS, \
+    CAPTURE_OPEN_TIMEOUT, CAPTURE_READ_TIMEOUT, CAPTURE_MAX_FAILURES, CAPTURE_RECONNECT_BACKOFF, \
+    CAPTURE_RECONNECT_MAX_BACKOFF
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class CaptureThread:
+    """Reads frames from a capture device into a small latest-frame slot.
+
+    The slot holds at most `slot_size` frames; when it is full the oldest frame
+    is dropped so consumers always see the most recent data. `on_frame`, if given,
+    is called with the camera index whenever a frame arrives.
+    """
+
+    def __init__(self, cap, index, slot_size=1, on_frame=None):
+        self.cap = cap
+        self.index = index
+        self.on_frame = on_frame
+        self.slot = deque(maxlen=slot_size)
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self._fps_window_start = time.monotonic()
+        self._fps_window_frames = 0
+        self.fps = 0.0
+        self.log = RateLimitedLogger()
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name=f"capture-{self.index}", daemon=True)
+            self.thread.start()
+            logging.info(f"Started capture thread for camera {self.index}")
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _run(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.read_failures += 1
+                self.log.log("read", logging.WARNING, f"Failed to read frame from camera {self.index}")
+                time.sleep(0.05)
+                continue
+
+            with self.lock:
+                if len(self.slot) == self.slot.maxlen:
+                    self.frames_dropped += 1
+                self.slot.append((frame, time.monotonic()))
+                self.frames_read += 1
+            if self.on_frame is not None:
+                self.on_frame(self.index)
+
+            self._fps_window_frames += 1
+            now = time.monotonic()
+            elapsed = now - self._fps_window_start
+            if elapsed >= 1.0:
+                self.fps = self._fps_window_frames / elapsed
+                self._fps_window_start = now
+                self._fps_window_frames = 0
+
+    def get_latest(self):
+        """Return (frame, capture time) for the newest frame and discard anything older.
+
+        Returns (None, None) if the slot is empty.
+        """
+        with self.lock:
+            if not self.slot:
+                return None, None
+            frame, captured_at = self.slot.pop()
+            self.frames_dropped += len(self.slot)
+            self.slot.clear()
+            return frame, captured_at
+
+    def queue_depth(self):
+        with self.lock:
+            return len(self.slot)
+
+    def get_stats(self):
+        return {
+            "fps": round(self.fps, 2),
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "read_failures": self.read_failures,
+            "queue_depth": self.queue_depth(),
+        }
+
+class ResilientCapture:
+    """Keeps a camera source connected, with the cv2.VideoCapture interface.
+
+    `source` is a device index, file path or stream URL, an object with the
+    VideoCapture interface (used as-is, e.g. src.sources.SyntheticSource), or a
+    callable returning one. A dict is taken as keyword arguments, so options can
+    be set per camera.
+
+    Opening never raises. A source that fails to open, returns
+    `max_failures` bad reads in a row, or fails a read that took longer than
+    `read_timeout`, is reconnected with exponential backoff. While it is down,
+    `read` returns (False, None) straight away instead of blocking the caller.
+    A file source that runs out of frames is marked as ended, not reconnected.
+    """
+
+    def __init__(self, source, name=None, backend=CAPTURE_BACKEND, buffer_size=CAPTURE_BUFFER_SIZE,
+                 fourcc=CAPTURE_FOURCC, resolution=CAPTURE_RESOLUTION, fps=CAPTURE_FPS,
+                 open_timeout=CAPTURE_OPEN_TIMEOUT, read_timeout=CAPTURE_READ_TIMEOUT,
+                 max_failures=CAPTURE_MAX_FAILURES, backoff=CAPTURE_RECONNECT_BACKOFF,
+                 max_backoff=CAPTURE_RECONNECT_MAX_BACKOFF):
+        self.source = source
+        self.name = name or str(source)
+        self.api = self._backend_id(backend)
+        self.buffer_size = buffer_size
+        self.fourcc = fourcc
+        self.resolution = resolution
+        self.fps = fps
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.max_failures = max_failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.log = RateLimitedLogger()
+
+        self.cap = None
+        self.state = "connecting"  # connecting, online, reconnecting, ended or closed
+        self.connects = 0
+        self.retries = 0  # Failed open attempts since the source was last online
+        self.next_attempt = 0.0
+        self.failures = 0  # Consecutive failed reads
+        self.read_failures = 0
+        self.stalls = 0
+        self.frames_read = 0
+        self.last_frame_at = None
+        self.last_error = None
+        self._connect()
+
+    @classmethod
+    def from_source(cls, source, name=None):
+        """Wrap a configured camera source; dict sources carry their own options."""
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, dict):
+            options = dict(source)
+            return cls(options.pop("source"), name=options.pop("name", name), **options)
+        return cls(source, name=name)
+
+    def _backend_id(self, backend):
+        if backend is None:
+            return cv2.CAP_ANY
+        if isinstance(backend, int):
+            return backend
+        api = getattr(cv2, f"CAP_{backend.upper()}", None)
+        if api is None:
+            logging.error(f"Unknown capture backend {backend!r} for {self.name}; letting OpenCV choose")
+            return cv2.CAP_ANY
+        return api
+
+    def _open_device(self):
+        if hasattr(self.source, "read"):
+            return self.source  # Reused across reconnects; isOpened() says whether it is back
+        if callable(self.source):
+            return self.source()
+        params = []
+        if isinstance(self.source, str) and not self.is_file:
+            # Network streams: bound how long FFMPEG may block on open and on each read
+            for prop, seconds in (("CAP_PROP_OPEN_TIMEOUT_MSEC", self.open_timeout),
+                                  ("CAP_PROP_READ_TIMEOUT_MSEC", self.read_timeout)):
+                if seconds and hasattr(cv2, prop):
+                    params += [getattr(cv2, prop), int(seconds * 1000)]
+        cap = cv2.VideoCapture(self.source, self.api, params) if params else cv2.VideoCapture(self.source, self.api)
+        if cap.isOpened() and not self.is_file:
+            self._configure(cap)
+        return cap
+
+    def _configure(self, cap):
+        # FOURCC goes first: some drivers only offer a resolution in a particular pixel format
+        settings = []
+        if self.fourcc:
+            settings.append(("fourcc", cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc)))
+        if self.resolution:
+            settings.append(("width", cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0]))
+            settings.append(("height", cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1]))
+        if self.fps:
+            settings.append(("fps", cv2.CAP_PROP_FPS, self.fps))
+        if self.buffer_size is not None:
+            settings.append(("buffer size", cv2.CAP_PROP_BUFFERSIZE, self.buffer_size))
+        for label, prop, value in settings:
+            if not cap.set(prop, value):
+                logging.warning(f"{self.name}: backend did not accept {label} {value}")
+
+    def _connect(self):
+        """Try to open the source once; on failure schedule the next attempt."""
+        cap, opened, error = None, False, f"Failed to open {self.name}"
+        try:
+            cap = self._open_device()
+            opened = cap.isOpened()
+        except Exception as e:
+            error = f"{error}: {e}"
+        if opened:
+            self.cap = cap
+            self.state = "online"
+            self.failures = 0
+            self.retries = 0
+            self.last_frame_at = time.monotonic()  # Start the stall clock
+            if self.connects:
+                logging.info(f"Reconnected to {self.name}")
+            else:
+                logging.info(f"Opened {self.name}")
+            self.connects += 1
+            return True
+
+        if cap is not None and cap is not self.source:
+            cap.release()
+        self.last_error = error
+        delay = min(self.max_backoff, self.backoff * 2 ** self.retries)
+        self.retries += 1
+        self.next_attempt = time.monotonic() + delay
+        self.state = "reconnecting" if self.connects else "connecting"
+        self.log.log("open", logging.WARNING, f"{self.last_error}; retrying in {delay:.1f}s")
+        return False
+
+    def _disconnect(self, reason):
+        self.last_error = reason
+        if self.cap is not None and self.cap is not self.source:
+            self.cap.release()
+        self.cap = None
+        self.failures = 0
+        if self.is_file:
+            self.state = "ended"
+            logging.info(f"{self.name}: end of file")
+            return
+        logging.warning(f"{self.name}: {reason}; reconnecting")
+        self.state = "reconnecting"
+        self.retries = 1
+        self.next_attempt = time.monotonic() + self.backoff
+
+    def isOpened(self):
+        return self.cap is not None
+
+    @property
+    def ended(self):
+        """True once the source will not deliver frames again (end of file or released)."""
+        return self.state in ("ended", "closed")
+
+    def retry_delay(self):
+        """Seconds until read() can next reach the source: 0 while connected, None once ended."""
+        if self.ended:
+            return None
+        if self.cap is not None:
+            return 0.0
+        return max(self.next_attempt - time.monotonic(), 0.0)
+
+    def read(self):
+        if self.cap is None:
+            if self.state in ("ended", "closed") or time.monotonic() < self.next_attempt or not self._connect():
+                return False, None
+        start = time.monotonic()
+        try:
+            ret, frame = self.cap.read()
+        except cv2.error as e:
+            ret, frame = False, None
+            self.last_error = f"Read error: {e}"
+        now = time.monotonic()
+        if now - start > self.read_timeout:
+            self.stalls += 1
+        if ret and frame is not None:
+            self.failures = 0
+            self.frames_read += 1
+            self.last_frame_at = now
+            return True, frame
+
+        self.failures += 1
+        self.read_failures += 1
+        if now - start > self.read_timeout:
+            self._disconnect(f"Read timed out after {now - start:.1f}s")
+        elif self.failures >= self.max_failures:
+            self._disconnect(f"{self.failures} consecutive failed reads")
+        return False, None
+
+    def get(self, prop):
+        return self.cap.get(prop) if self.cap is not None else 0.0
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value) if self.cap is not None else False
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        elif hasattr(self.source, "release"):
+            self.source.release()
+        self.state = "closed"
+
+    def health(self):
+        """Capture state and reconnect counters.
+
+        An online source that has not delivered a frame for `read_timeout` reports
+        "stalled", which also covers a read that is still blocked on another thread.
+        """
+        now = time.monotonic()
+        state = self.state
+        frame_age = now - self.last_frame_at if self.last_frame_at is not None else None
+        if state == "online" and frame_age is not None and frame_age > self.read_timeout:
+            state = "stalled"
+        return {
+            "capture_state": state,
+            "capture_online": int(state == "online"),
+            "capture_reconnects": max(self.connects - 1, 0),
+            "capture_read_failures": self.read_failures,
+            "capture_stalls": self.stalls,
+            "capture_frame_age_s": round(frame_age, 2) if frame_age is not None else None,
+            "capture_retry_in_s": round(max(self.next_attempt - now, 0.0), 1)
+                                  if self.cap is None and not self.ended else None,
+            "capture_error": self.last_error,
+        }
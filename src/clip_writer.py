@@ -0,0 +1,147 @@
+import cv2
+import multiprocessing
+import os
+import queue
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from config.config import WRITER_QUEUE_SIZE, WRITER_PUT_TIMEOUT, COMPRESSION_WORKERS, FOURCC
+from src.utilities import compress_video
+from src.metrics import StageTimer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_compression_pool = None
+_pool_lock = threading.Lock()
+
+def get_compression_pool():
+    """Process pool that runs compress_video off the capture and writer threads.
+
+    Workers are spawned rather than forked, so they never inherit the locks of
+    the capture, writer and detector threads running in this process.
+    """
+    global _compression_pool
+    with _pool_lock:
+        if _compression_pool is None:
+            _compression_pool = ProcessPoolExecutor(max_workers=COMPRESSION_WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+        return _compression_pool
+
+def shutdown_compression_pool(wait=True):
+    global _compression_pool
+    with _pool_lock:
+        if _compression_pool is not None:
+            _compression_pool.shutdown(wait=wait)
+            _compression_pool = None
+
+class ClipWriter:
+    """Writes one clip on a dedicated thread from a bounded frame queue.
+
+    `write` never blocks longer than WRITER_PUT_TIMEOUT: when the queue is full the
+    frame is dropped and counted. After the last frame the file is released and,
+    if `compress_to` is set, compression is handed to the process pool.
+    `on_written(writer)` and `on_compressed(writer)` are called when each step finishes.
+
+    If the file cannot be opened with `fourcc` (e.g. no H.264 encoder), the clip is
+    written to `fallback_path` with FOURCC instead and `path` is updated; the
+    original path becomes the compression target.
+    """
+
+    def __init__(self, path, frame_size, fps, fourcc, label, compress_to=None, queue_size=WRITER_QUEUE_SIZE, timer=None,
+                 on_written=None, on_compressed=None, fallback_path=None):
+        self.path = path
+        self.fallback_path = fallback_path
+        self.frame_size = frame_size
+        self.fps = fps
+        self.fourcc = fourcc
+        self.label = label
+        self.compress_to = compress_to
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.compression = None
+        self.timer = timer if timer is not None else StageTimer()
+        self.on_written = on_written
+        self.on_compressed = on_compressed
+        self.thread = threading.Thread(target=self._run, name=f"writer-{label}", daemon=True)
+        self.thread.start()
+
+    def write(self, frame, annotations):
+        """Queue a copy of the frame; returns False if it was dropped under backpressure."""
+        try:
+            self.queue.put((frame.copy(), annotations), timeout=WRITER_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            if self.frames_dropped == 1 or self.frames_dropped % 50 == 0:
+                logging.warning(f"Writer for {self.path} is behind, {self.frames_dropped} frames dropped")
+            return False
+
+    def close(self):
+        """Finish the clip once queued frames are written; does not wait for the writer."""
+        self.queue.put(None)
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def _open(self):
+        out = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.frame_size)
+        if out.isOpened():
+            return out
+        logging.error(f"Could not open {self.path} for writing with codec {self.fourcc}")
+        if self.fallback_path is None or self.fourcc == FOURCC:
+            return None
+        if self.compress_to is None:
+            self.compress_to = self.path
+        self.path, self.fourcc = self.fallback_path, FOURCC
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        logging.warning(f"Writing {self.path} with codec {self.fourcc} instead")
+        return self._open()
+
+    def _run(self):
+        out = self._open()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if out is None:
+                self.frames_dropped += 1
+                continue
+            frame, annotations = item
+            with self.timer.stage("draw"):
+                for (x, y, w, h, label) in annotations:
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                    cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                cv2.putText(frame, f"Recording: {self.label}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            with self.timer.stage("write"):
+                out.write(frame)
+            self.frames_written += 1
+        if out is None:
+            logging.error(f"Clip {self.path} was not written, {self.frames_dropped} frames dropped")
+            return
+        out.release()
+        logging.info(f"Finished writing {self.path}: {self.frames_written} frames, {self.frames_dropped} dropped")
+        self._notify(self.on_written)
+
+        if self.compress_to is not None:
+            os.makedirs(os.path.dirname(self.compress_to), exist_ok=True)
+            self.compression = get_compression_pool().submit(compress_video, self.path, self.compress_to)
+            self.compression.add_done_callback(self._compression_done)
+
+    def _compression_done(self, future):
+        if future.exception() is not None:
+            logging.error(f"Compression of {self.path} failed: {future.exception()}")
+        else:
+            logging.info(f"Compressed video saved: {self.compress_to}")
+            self._notify(self.on_compressed)
+
+    def _notify(self, callback):
+        if callback is None:
+            return
+        try:
+            callback(self)
+        except Exception as e:
+            logging.error(f"Clip callback for {self.path} failed: {e}")
@@ -0,0 +1,184 @@
+import math
+import cv2
+import numpy as np
+import logging
+from config.config import STITCH_MODE, MOSAIC_COLUMNS, MOSAIC_TILE_SIZE
+from src.utilities import stitch_images
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def _offset_annotations(annotations, scale_x, scale_y, offset_x, offset_y):
+    return [(int(x * scale_x + offset_x), int(y * scale_y + offset_y), int(w * scale_x), int(h * scale_y), label)
+            for (x, y, w, h, label) in annotations]
+
+class GridCompositor:
+    """Lays camera frames out on a preallocated mosaic canvas.
+
+    Each camera keeps a fixed tile (by camera index) and is scaled to fit it with
+    its aspect ratio preserved. The canvas and per-tile scratch buffers are only
+    reallocated when the layout or an input resolution changes, so the returned
+    canvas is reused between calls.
+
+    After each call `tiles` maps every composed camera index to (3x3 matrix from
+    camera to canvas coordinates, camera frame size), so overlays can be drawn per tile.
+    """
+
+    def __init__(self, num_tiles, columns=MOSAIC_COLUMNS, tile_size=MOSAIC_TILE_SIZE):
+        self.num_tiles = num_tiles
+        self.columns = columns or math.ceil(math.sqrt(num_tiles))
+        self.rows = math.ceil(num_tiles / self.columns)
+        self.tile_size = tile_size
+        self.canvas = None
+        self.scratch = {}  # Tile index -> (input shape, resized buffer, scale)
+        self.tiles = {}
+
+    def _allocate(self, frame):
+        tile_w, tile_h = self.tile_size
+        self.canvas = np.zeros((self.rows * tile_h, self.columns * tile_w, frame.shape[2]), dtype=frame.dtype)
+        self.scratch = {}
+        logging.info(f"Allocated {self.rows}x{self.columns} mosaic canvas {self.canvas.shape}")
+
+    def _tile_geometry(self, index, frame):
+        cached = self.scratch.get(index)
+        if cached is not None and cached[0] == frame.shape:
+            return cached
+        tile_w, tile_h = self.tile_size
+        scale = min(tile_w / frame.shape[1], tile_h / frame.shape[0])
+        size = (max(1, int(frame.shape[1] * scale)), max(1, int(frame.shape[0] * scale)))
+        buffer = np.empty((size[1], size[0], frame.shape[2]), dtype=frame.dtype)
+        # Clear the tile once so letterbox borders stay black
+        row, col = divmod(index, self.columns)
+        self.canvas[row * tile_h:(row + 1) * tile_h, col * tile_w:(col + 1) * tile_w] = 0
+        self.scratch[index] = (frame.shape, buffer, scale)
+        return self.scratch[index]
+
+    def compose(self, frames, annotations, indices=None):
+        """Write frames into their tiles; returns the canvas and annotations in mosaic coordinates."""
+        if not frames:
+            return None, []
+        indices = range(len(frames)) if indices is None else indices
+        if self.canvas is None or self.canvas.shape[2] != frames[0].shape[2]:
+            self._allocate(frames[0])
+
+        tile_w, tile_h = self.tile_size
+        mosaic_annotations = []
+        self.tiles = {}
+        for index, frame, frame_annotations in zip(indices, frames, annotations):
+            _, buffer, scale = self._tile_geometry(index, frame)
+            cv2.resize(frame, (buffer.shape[1], buffer.shape[0]), dst=buffer, interpolation=cv2.INTER_AREA)
+            row, col = divmod(index, self.columns)
+            y0, x0 = row * tile_h, col * tile_w
+            self.canvas[y0:y0 + buffer.shape[0], x0:x0 + buffer.shape[1]] = buffer
+            mosaic_annotations.extend(_offset_annotations(frame_annotations, scale, scale, x0, y0))
+            self.tiles[index] = (np.array([[scale, 0, x0], [0, scale, y0], [0, 0, 1]], dtype=np.float64),
+                                 (frame.shape[1], frame.shape[0]))
+        return self.canvas, mosaic_annotations
+
+class PanoramaCompositor:
+    """Panorama whose homographies are estimated once and then only warped per frame.
+
+    Calibration matches ORB features between every camera and camera 0. If it
+    fails (too little overlap), frames are composed on a grid instead and
+    calibration is retried every `retry_interval` calls. `tiles` is as for
+    GridCompositor, with each camera's homography as its matrix.
+    """
+
+    def __init__(self, num_tiles, retry_interval=100):
+        self.fallback = GridCompositor(num_tiles)
+        self.retry_interval = retry_interval
+        self.homographies = None
+        self.canvas = None
+        self.input_shapes = None
+        self.calls_since_attempt = retry_interval
+        self.tiles = {}
+
+    def calibrate(self, frames):
+        orb = cv2.ORB_create(2000)
+        matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        reference = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
+        ref_kp, ref_desc = orb.detectAndCompute(reference, None)
+        homographies = [np.eye(3)]
+        for frame in frames[1:]:
+            kp, desc = orb.detectAndCompute(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), None)
+            if desc is None or ref_desc is None:
+                return False
+            matches = sorted(matcher.match(desc, ref_desc), key=lambda m: m.distance)[:500]
+            if len(matches) < 10:
+                return False
+            src = np.float32([kp[m.queryIdx].pt for m in matches]).reshape(-1, 1, 2)
+            dst = np.float32([ref_kp[m.trainIdx].pt for m in matches]).reshape(-1, 1, 2)
+            H, _ = cv2.findHomography(src, dst, cv2.RANSAC, 5.0)
+            if H is None:
+                return False
+            homographies.append(H)
+
+        corners = []
+        for frame, H in zip(frames, homographies):
+            h, w = frame.shape[:2]
+            box = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+            corners.append(cv2.perspectiveTransform(box, H))
+        corners = np.concatenate(corners).reshape(-1, 2)
+        x_min, y_min = np.floor(corners.min(axis=0)).astype(int)
+        x_max, y_max = np.ceil(corners.max(axis=0)).astype(int)
+        if (x_max - x_min) * (y_max - y_min) > 4 * sum(frame.shape[0] * frame.shape[1] for frame in frames):
+            return False  # Degenerate homography
+        translate = np.array([[1, 0, -x_min], [0, 1, -y_min], [0, 0, 1]], dtype=np.float64)
+
+        self.homographies = [translate @ H for H in homographies]
+        self.canvas = np.zeros((y_max - y_min, x_max - x_min, frames[0].shape[2]), dtype=frames[0].dtype)
+        self.input_shapes = [frame.shape for frame in frames]
+        logging.info(f"Panorama calibrated, canvas {self.canvas.shape}")
+        return True
+
+    def compose(self, frames, annotations, indices=None):
+        if not frames:
+            return None, []
+        indices = list(range(len(frames))) if indices is None else list(indices)
+        if self.homographies is not None and \
+                any(frame.shape != self.input_shapes[i] for i, frame in zip(indices, frames)):
+            logging.info("Camera resolution changed, recalibrating panorama")
+            self.homographies = None
+            self.calls_since_attempt = self.retry_interval
+        if self.homographies is None:
+            if len(frames) == self.fallback.num_tiles and self.calls_since_attempt >= self.retry_interval:
+                self.calls_since_attempt = 0
+                if not self.calibrate(frames):
+                    logging.warning("Panorama calibration failed, using grid layout")
+            self.calls_since_attempt += 1
+            if self.homographies is None:
+                result = self.fallback.compose(frames, annotations, indices)
+                self.tiles = self.fallback.tiles
+                return result
+
+        size = (self.canvas.shape[1], self.canvas.shape[0])
+        panorama_annotations = []
+        self.tiles = {}
+        for index, frame, frame_annotations in zip(indices, frames, annotations):
+            H = self.homographies[index]
+            self.tiles[index] = (H, (frame.shape[1], frame.shape[0]))
+            cv2.warpPerspective(frame, H, size, dst=self.canvas, borderMode=cv2.BORDER_TRANSPARENT)
+            for (x, y, w, h, label) in frame_annotations:
+                box = np.float32([[x, y], [x + w, y], [x + w, y + h], [x, y + h]]).reshape(-1, 1, 2)
+                bx, by, bw, bh = cv2.boundingRect(cv2.perspectiveTransform(box, H))
+                panorama_annotations.append((bx, by, bw, bh, label))
+        return self.canvas, panorama_annotations
+
+class StitcherCompositor:
+    """Legacy per-frame cv2.Stitcher path (annotations from the first camera only).
+
+    Tile geometry is unknown, so `tiles` stays empty.
+    """
+
+    tiles = {}
+
+    def compose(self, frames, annotations, indices=None):
+        return stitch_images(frames), annotations[0] if annotations else []
+
+def create_compositor(num_tiles, mode=STITCH_MODE):
+    if mode == "grid":
+        return GridCompositor(num_tiles)
+    if mode == "panorama":
+        return PanoramaCompositor(num_tiles)
+    if mode == "stitcher":
+        return StitcherCompositor()
+    raise ValueError(f"Unknown stitch mode: {mode}")
@@ -0,0 +1,303 @@
+import os
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from config.config import DETECTOR_BACKEND, DETECTOR_REPO, DETECTOR_MODEL, DETECTOR_WEIGHTS, \
+    DETECTOR_MAX_BATCH, DETECTOR_BATCH_TIMEOUT, DETECTOR_INPUT_SIZE, DETECTOR_MODEL_TIERS, DETECTOR_BACKGROUND_LOAD, DETECTOR_WARMUP, \
+    DETECTOR_LOAD_RETRY, FRAME_WIDTH
+from src.metrics import startup_clock
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def _empty_detections():
+    return np.zeros((0, 6), dtype=np.float32)
+
+class TorchHubBackend:
+    """YOLOv5 loaded through torch.hub (downloads or uses the hub cache)."""
+
+    def __init__(self, repo=DETECTOR_REPO, model_name=DETECTOR_MODEL):
+        self.repo = repo
+        self.model_name = model_name
+        self.model = None
+        self.names = {}
+
+    def load(self):
+        import torch
+        logging.info(f"Loading detector model {self.repo}:{self.model_name}")
+        self.model = torch.hub.load(self.repo, self.model_name, pretrained=True)
+        self.names = self.model.names
+
+    def infer(self, frames, size=None):
+        """Run one forward pass over a list of frames; returns an (N, 6) array per frame.
+
+        Frames are letterboxed so their longest side is `size` (DETECTOR_INPUT_SIZE by default).
+        """
+        results = self.model(list(frames), size=size or DETECTOR_INPUT_SIZE)
+        return [det.cpu().numpy() for det in results.xyxy]
+
+class LocalWeightsBackend(TorchHubBackend):
+    """YOLOv5 with weights from a local file, usable without network access when the repo is local."""
+
+    def __init__(self, weights_path, repo=DETECTOR_REPO):
+        super().__init__(repo, "custom")
+        self.weights_path = weights_path
+
+    def load(self):
+        import torch
+        if not os.path.exists(self.weights_path):
+            raise FileNotFoundError(f"Detector weights not found: {self.weights_path}")
+        source = "local" if os.path.isdir(self.repo) else "github"
+        logging.info(f"Loading detector weights from {self.weights_path}")
+        self.model = torch.hub.load(self.repo, "custom", path=self.weights_path, source=source)
+        self.names = self.model.names
+
+class StubBackend:
+    """Offline backend that calls `detect_fn(frame)` for every frame.
+
+    `detect_fn` must return rows of (x1, y1, x2, y2, conf, cls). With no function
+    the stub reports nothing, which is handy for exercising the rest of the pipeline.
+    """
+
+    def __init__(self, detect_fn=None, names=None):
+        self.detect_fn = detect_fn
+        self.names = names if names is not None else {0: "person", 2: "car", 7: "truck"}
+
+    def load(self):
+        pass
+
+    def infer(self, frames, size=None):
+        if self.detect_fn is None:
+            return [_empty_detections() for _ in frames]
+        return [np.asarray(self.detect_fn(frame), dtype=np.float32).reshape(-1, 6) for frame in frames]
+
+class Detector:
+    """Process-wide detector shared by every VideoProcessor.
+
+    `detect_batch` runs a list of frames through the backend as one forward pass.
+    `detect` is for callers on separate threads: concurrent requests are gathered
+    by a dispatcher thread and batched together, waiting at most `batch_timeout`
+    seconds for the other callers to submit their frames. Set the number of
+    threads that call `detect` with `set_callers`; until then one per registered
+    client is assumed.
+
+    `tiers` are factories for cheaper backends (tier 1, 2, ...; tier 0 is `backend`).
+    Clients ask for a tier with `request_tier`; the cheapest tier any client asked
+    for is loaded in the background and swapped in once ready.
+
+    With `background`, the model is loaded (and warmed up) on its own thread and
+    retried every DETECTOR_LOAD_RETRY seconds if loading fails. Callers check
+    `ready` and skip detection until it is set.
+    """
+
+    def __init__(self, backend, max_batch_size=DETECTOR_MAX_BATCH, batch_timeout=DETECTOR_BATCH_TIMEOUT, tiers=None,
+                 background=False, warmup=DETECTOR_WARMUP):
+        self.backend = backend
+        self.names = {}
+        self.warmup = warmup
+        self.ready = threading.Event()
+        self.load_seconds = None
+        self.tier_factories = [None] + list(tiers or [])
+        self.tier_backends = {0: backend}
+        self.tier = 0
+        self.tier_requests = {}
+        self.tier_loading = None
+        self.max_batch_size = max_batch_size
+        self.batch_timeout = batch_timeout
+        self.clients = 0
+        self.callers = None  # Threads calling detect() concurrently; None assumes one per client
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.dispatcher = None
+        self.batches_run = 0
+        self.frames_detected = 0
+        self.latencies = deque(maxlen=1000)  # Seconds per forward pass, most recent batches
+        if background:
+            threading.Thread(target=self._load_in_background, name="detector-load", daemon=True).start()
+        else:
+            self._load()
+
+    def _load(self):
+        start = time.perf_counter()
+        self.backend.load()
+        self._warm_up(self.backend)
+        with self.lock:
+            self.names = self.backend.names
+            self.load_seconds = time.perf_counter() - start
+            self.ready.set()
+        startup_clock.mark("detector_ready")
+        logging.info(f"Detector ready after {self.load_seconds:.2f}s")
+
+    def _load_in_background(self):
+        while True:
+            try:
+                self._load()
+                return
+            except Exception as e:
+                logging.error(f"Failed to load detector, running motion-only; "
+                              f"retrying in {DETECTOR_LOAD_RETRY:g}s: {e}")
+                time.sleep(DETECTOR_LOAD_RETRY)
+
+    def _warm_up(self, backend):
+        """Run one dummy inference so the first real frame does not pay for lazy initialization."""
+        if self.warmup:
+            start = time.perf_counter()
+            backend.infer([np.zeros((FRAME_WIDTH * 3 // 4, FRAME_WIDTH, 3), dtype=np.uint8)])
+            logging.info(f"Detector warm-up inference took {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    @property
+    def is_ready(self):
+        return self.ready.is_set()
+
+    def register(self):
+        with self.lock:
+            self.clients += 1
+
+    def unregister(self):
+        with self.lock:
+            self.clients = max(0, self.clients - 1)
+
+    def set_callers(self, callers):
+        """Tell the dispatcher how many threads call `detect` concurrently (e.g. processing workers)."""
+        self.callers = callers
+
+    def request_tier(self, client, tier):
+        """Ask for model `tier` on behalf of `client`; None withdraws the client's request."""
+        with self.lock:
+            if tier is None:
+                self.tier_requests.pop(client, None)
+            else:
+                self.tier_requests[client] = min(tier, len(self.tier_factories) - 1)
+            wanted = max(self.tier_requests.values(), default=0)
+            if wanted == self.tier or self.tier_loading is not None:
+                return
+            if wanted in self.tier_backends:
+                self._switch_tier(wanted)
+                return
+            self.tier_loading = wanted
+        threading.Thread(target=self._load_tier, args=(wanted,), name="detector-tier", daemon=True).start()
+
+    def _load_tier(self, tier):
+        try:
+            backend = self.tier_factories[tier]()
+            backend.load()
+            self._warm_up(backend)
+        except Exception as e:
+            logging.error(f"Failed to load detector tier {tier}: {e}")
+            backend = None
+        with self.lock:
+            self.tier_loading = None
+            if backend is not None:
+                self.tier_backends[tier] = backend
+                if tier == max(self.tier_requests.values(), default=0):
+                    self._switch_tier(tier)
+
+    def _switch_tier(self, tier):
+        # Called with the lock held, so no batch is running on the old backend
+        self.backend = self.tier_backends[tier]
+        self.names = self.backend.names
+        self.tier = tier
+        logging.info(f"Detector switched to model tier {tier}")
+
+    def detect_batch(self, frames, size=None):
+        """Detect objects in `frames` with one forward pass at model input size `size` (None for the default)."""
+        if not frames:
+            return []
+        with self.lock:
+            start = time.perf_counter()
+            detections = self.backend.infer(frames, size)
+            self.latencies.append(time.perf_counter() - start)
+            if not self.batches_run:
+                startup_clock.mark("first_detection")
+            self.batches_run += 1
+            self.frames_detected += len(frames)
+        return detections
+
+    def detect(self, frame, size=None):
+        """Detect objects in a single frame, batching with other threads' requests for the same size."""
+        if self.dispatcher is None:
+            with self.lock:
+                if self.dispatcher is None:
+                    self.dispatcher = threading.Thread(target=self._dispatch, name="detector", daemon=True)
+                    self.dispatcher.start()
+        future = Future()
+        self.requests.put((frame, size, future))
+        return future.result()
+
+    def _dispatch(self):
+        while True:
+            batch = [self.requests.get()]
+            # A batch can hold at most one frame per calling thread, however many cameras share them
+            callers = self.callers if self.callers is not None else self.clients
+            expected = max(1, min(self.max_batch_size, callers))
+            while len(batch) < expected:
+                try:
+                    batch.append(self.requests.get(timeout=self.batch_timeout))
+                except queue.Empty:
+                    break
+            # Frames are letterboxed to one input size per forward pass
+            groups = {}
+            for frame, size, future in batch:
+                groups.setdefault(size, []).append((frame, future))
+            for size, group in groups.items():
+                try:
+                    detections = self.detect_batch([frame for frame, _ in group], size)
+                    for (_, future), result in zip(group, detections):
+                        future.set_result(result)
+                except Exception as e:
+                    logging.error(f"Detector batch of {len(group)} failed: {e}")
+                    for _, future in group:
+                        future.set_exception(e)
+
+    def get_stats(self):
+        latencies = np.array(self.latencies.copy()) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "batches": self.batches_run,
+            "frames": self.frames_detected,
+            "mean_batch_size": round(self.frames_detected / self.batches_run, 2) if self.batches_run else 0.0,
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "latency_p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "model_tier": self.tier,
+            "ready": self.is_ready,
+            "load_seconds": round(self.load_seconds, 2) if self.load_seconds is not None else None,
+        }
+
+_shared_detector = None
+_shared_lock = threading.Lock()
+
+def create_backend(name=DETECTOR_BACKEND):
+    if name == "torch_hub":
+        return TorchHubBackend()
+    if name == "weights":
+        return LocalWeightsBackend(DETECTOR_WEIGHTS)
+    if name == "stub":
+        return StubBackend()
+    raise ValueError(f"Unknown detector backend: {name}")
+
+def create_tiers(name=DETECTOR_BACKEND):
+    """Backend factories for the cheaper DETECTOR_MODEL_TIERS (torch_hub only)."""
+    if name != "torch_hub":
+        return []
+    return [lambda model_name=model_name: TorchHubBackend(model_name=model_name)
+            for model_name in DETECTOR_MODEL_TIERS[1:]]
+
+def get_shared_detector(backend=DETECTOR_BACKEND):
+    """Return the process-wide Detector, loading `backend` on first use.
+
+    With DETECTOR_BACKGROUND_LOAD the model loads on a background thread, so this returns at once.
+    """
+    global _shared_detector
+    with _shared_lock:
+        if _shared_detector is None:
+            _shared_detector = Detector(create_backend(backend), tiers=create_tiers(backend),
+                                        background=DETECTOR_BACKGROUND_LOAD)
+        return _shared_detector
+
+def set_shared_detector(detector):
+    """Replace the process-wide Detector, e.g. with a stub backend for offline runs."""
+    global _shared_detector
+    with _shared_lock:
+        _shared_detector = detector
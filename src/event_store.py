@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+import cv2
+from config.config import EVENT_DB_PATH, EVENT_THUMBNAIL_WIDTH
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    camera INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    direction TEXT,
+    zone TEXT,
+    labels TEXT NOT NULL DEFAULT '',
+    clip_path TEXT NOT NULL,
+    compressed_path TEXT,
+    fps REAL NOT NULL,
+    trigger_frame INTEGER NOT NULL DEFAULT 0,
+    frames INTEGER,
+    thumbnail BLOB
+);
+CREATE INDEX IF NOT EXISTS events_started ON events (started_at);
+CREATE INDEX IF NOT EXISTS events_camera_started ON events (camera, started_at);
+CREATE TABLE IF NOT EXISTS event_labels (
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    label TEXT NOT NULL,
+    PRIMARY KEY (label, event_id)
+);
+"""
+
+# Columns returned by queries; thumbnails are fetched separately
+COLUMNS = ("id", "camera", "started_at", "ended_at", "direction", "zone", "labels", "clip_path", "compressed_path",
+           "fps", "trigger_frame", "frames")
+
+def encode_thumbnail(frame, width=EVENT_THUMBNAIL_WIDTH):
+    """Small JPEG of a frame for the recording browser."""
+    h, w = frame.shape[:2]
+    if w > width:
+        frame = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return data.tobytes() if ok else None
+
+class EventStore:
+    """SQLite index of recorded events, so recordings can be found without scanning directories.
+
+    Each event row holds the camera, start and end time, what triggered it, the
+    clip paths, the frame of the clip where the trigger happened and a JPEG
+    thumbnail. The connection is shared between threads behind a lock.
+    """
+
+    def __init__(self, path=EVENT_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            # WAL keeps readers (the UI) from blocking the recorder's inserts
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.conn.executescript(SCHEMA)
+
+    def start_event(self, camera, clip_path, fps, compressed_path=None, started_at=None, direction=None, zone=None,
+                    labels=(), trigger_frame=0, thumbnail=None):
+        """Insert an event when its recording starts; returns the event id."""
+        labels = sorted(set(labels))
+        started_at = started_at if started_at is not None else time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO events (camera, started_at, direction, zone, labels, clip_path, compressed_path, fps, "
+                "trigger_frame, thumbnail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (camera, started_at, direction, zone, ",".join(labels), clip_path, compressed_path, fps,
+                 trigger_frame, thumbnail))
+            event_id = cursor.lastrowid
+            self.conn.executemany("INSERT INTO event_labels (event_id, label) VALUES (?, ?)",
+                                  [(event_id, label) for label in labels])
+        return event_id
+
+    def add_labels(self, event_id, labels):
+        """Add labels to an existing event, e.g. from later crossings merged into its clip."""
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO event_labels (event_id, label) VALUES (?, ?)",
+                                  [(event_id, label) for label in set(labels)])
+            rows = self.conn.execute("SELECT label FROM event_labels WHERE event_id = ? ORDER BY label",
+                                     (event_id,)).fetchall()
+            self.conn.execute("UPDATE events SET labels = ? WHERE id = ?",
+                              (",".join(row["label"] for row in rows), event_id))
+
+    def finish_event(self, event_id, ended_at=None):
+        """Record when the event's recording stopped."""
+        self.update_event(event_id, ended_at=ended_at if ended_at is not None else time.time())
+
+    def update_event(self, event_id, **fields):
+        """Set ended_at, frames, clip_path (if the writer fell back to another file) or compressed_path once known."""
+        unknown = set(fields) - {"ended_at", "frames", "clip_path", "compressed_path"}
+        if unknown:
+            raise ValueError(f"Cannot update event fields: {sorted(unknown)}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE events SET {assignments} WHERE id = ?", (*fields.values(), event_id))
+
+    def query(self, start=None, end=None, camera=None, label=None, limit=100):
+        """Events newest first, optionally limited to a time range (epoch seconds), camera or label."""
+        sql = f"SELECT {', '.join('e.' + column for column in COLUMNS)} FROM events e"
+        conditions, params = [], []
+        if label is not None:
+            sql += " JOIN event_labels l ON l.event_id = e.id"
+            conditions.append("l.label = ?")
+            params.append(label.capitalize())
+        if start is not None:
+            conditions.append("e.started_at >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("e.started_at < ?")
+            params.append(end)
+        if camera is not None:
+            conditions.append("e.camera = ?")
+            params.append(camera)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY e.started_at DESC, e.id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest(self, camera=None):
+        events = self.query(camera=camera, limit=1)
+        return events[0] if events else None
+
+    def thumbnail(self, event_id):
+        """JPEG bytes of an event's thumbnail, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT thumbnail FROM events WHERE id = ?", (event_id,)).fetchone()
+        return row["thumbnail"] if row is not None else None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def playback_path(event):
+    """The compressed clip once compression has finished, otherwise the original."""
+    compressed = event.get("compressed_path")
+    if compressed and os.path.exists(compressed):
+        return compressed
+    return event["clip_path"]
+
+_event_store = None
+_store_lock = threading.Lock()
+
+def get_event_store():
+    """Process-wide event store at EVENT_DB_PATH, opened on first use."""
+    global _event_store
+    with _store_lock:
+        if _event_store is None:
+            _event_store = EventStore()
+        return _event_store
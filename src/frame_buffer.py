@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+import logging
+from collections import deque
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class FrameRingBuffer:
+    """Fixed-size pre-event buffer backed by one preallocated array.
+
+    Storage of shape (capacity, height, width, channels) is allocated on the first
+    frame and frames are copied into their slot in place, so steady-state appends
+    allocate nothing. A change of resolution reallocates and clears the buffer.
+    Iteration yields (frame, annotations) from oldest to newest; the frames are
+    views into the buffer and are overwritten by later appends.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.frames = None
+        self.annotations = [None] * capacity
+        self.start = 0
+        self.count = 0
+
+    def append(self, frame, annotations):
+        if self.frames is None or self.frames.shape[1:] != frame.shape or self.frames.dtype != frame.dtype:
+            self.frames = np.empty((self.capacity,) + frame.shape, dtype=frame.dtype)
+            self.clear()
+            logging.info(f"Allocated frame buffer {self.frames.shape} ({self.nbytes / 1e6:.1f} MB)")
+
+        if self.count < self.capacity:
+            index = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        np.copyto(self.frames[index], frame)
+        self.annotations[index] = annotations
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+        self.annotations = [None] * self.capacity
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for offset in range(self.count):
+            index = (self.start + offset) % self.capacity
+            yield self.frames[index], self.annotations[index]
+
+    @property
+    def nbytes(self):
+        return 0 if self.frames is None else self.frames.nbytes
+
+class CompressedFrameBuffer:
+    """Pre-event buffer that keeps JPEG-encoded frames to reduce resident memory."""
+
+    def __init__(self, capacity, quality=90):
+        self.buffer = deque(maxlen=capacity)
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+
+    def append(self, frame, annotations):
+        ok, encoded = cv2.imencode(".jpg", frame, self.params)
+        if not ok:
+            logging.warning("Failed to encode frame for the pre-event buffer")
+            return
+        self.buffer.append((encoded, annotations))
+
+    def clear(self):
+        self.buffer.clear()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __iter__(self):
+        for encoded, annotations in list(self.buffer):
+            yield cv2.imdecode(encoded, cv2.IMREAD_COLOR), annotations
+
+    @property
+    def nbytes(self):
+        return sum(encoded.nbytes for encoded, _ in self.buffer)
@@ -0,0 +1,88 @@
+import json
+import sys
+import time
+import logging
+from datetime import datetime
+from src.metrics import startup_clock
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class HeadlessRunner:
+    """Drives CameraManager.process_feeds without any rendering.
+
+    Events and periodic stats are written as JSON lines to `stream` (stdout by
+    default); log messages keep going to stderr.
+    """
+
+    def __init__(self, camera_manager, duration=None, max_fps=None, stats_interval=10.0, stream=None):
+        self.camera_manager = camera_manager
+        self.duration = duration
+        self.min_period = 1.0 / max_fps if max_fps else 0.0
+        self.stats_interval = stats_interval
+        self.stream = stream if stream is not None else sys.stdout
+        self.running = False
+        self.frames_at_last_stats = {}  # Camera -> processed_frames when the previous stats line was written
+
+    def emit(self, record):
+        record.setdefault("time", datetime.now().isoformat(timespec="milliseconds"))
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def emit_stats(self, frames, elapsed):
+        """Write a stats line; loop and per-camera fps cover the `elapsed` seconds since the previous one."""
+        cameras = self.camera_manager.get_stats()
+        for camera_stats in cameras:
+            camera, processed = camera_stats["camera"], camera_stats["processed_frames"]
+            camera_stats["processed_fps_avg"] = camera_stats["processed_fps"]  # Since startup
+            delta = processed - self.frames_at_last_stats.get(camera, 0)
+            camera_stats["processed_fps"] = round(delta / elapsed, 2) if elapsed > 0 else 0.0
+            self.frames_at_last_stats[camera] = processed
+        self.emit({
+            "type": "stats",
+            "loop_fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+            "cameras": cameras,
+            "detector": self.camera_manager.detector.get_stats() if self.camera_manager.detector is not None else None,
+            "startup": startup_clock.summary(),
+        })
+
+    def run(self):
+        self.running = True
+        started = last_stats = time.monotonic()
+        frames_since_stats = 0
+        logging.info("Headless monitoring started")
+        try:
+            while self.running:
+                loop_start = time.monotonic()
+                if self.duration is not None and loop_start - started >= self.duration:
+                    break
+
+                frame, _, _, _ = self.camera_manager.process_feeds()
+                if frame is not None:
+                    frames_since_stats += 1
+                for event in self.camera_manager.events:
+                    self.emit(event)
+
+                now = time.monotonic()
+                if self.stats_interval and now - last_stats >= self.stats_interval:
+                    self.emit_stats(frames_since_stats, now - last_stats)
+                    last_stats = now
+                    frames_since_stats = 0
+
+                if not self.camera_manager.results_collected:
+                    if self.camera_manager.all_sources_ended():
+                        logging.info("Every source has ended")
+                        break
+                    self.camera_manager.wait_for_results()
+                    continue
+                remaining = self.min_period - (time.monotonic() - loop_start)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except KeyboardInterrupt:
+            logging.info("Interrupted")
+        finally:
+            self.emit_stats(frames_since_stats, max(time.monotonic() - last_stats, 1e-6))
+            self.camera_manager.release()
+            logging.info("Headless monitoring stopped")
+
+    def stop(self):
+        self.running = False
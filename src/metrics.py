@@ -0,0 +1,293 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Exponential buckets from 50 us to ~6.5 s
+DEFAULT_BUCKETS = tuple(0.00005 * 2 ** k for k in range(18))
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two additions."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside the bucket that contains it."""
+        with self.lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def cumulative(self):
+        """[(upper bound, cumulative count)], ending with +Inf, plus the sum and count."""
+        with self.lock:
+            counts, total_sum, total = list(self.counts), self.sum, self.count
+        bounds = list(self.buckets) + [float("inf")]
+        running, result = 0, []
+        for bound, count in zip(bounds, counts):
+            running += count
+            result.append((bound, running))
+        return result, total_sum, total
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum * 1000 / self.count, 4) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 4),
+            "p99_ms": round(self.quantile(0.99) * 1000, 4),
+        }
+
+class StageTimer:
+    """Accumulates wall-clock time per named pipeline stage, with a histogram per stage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.counts = {}
+        self.histograms = {}
+
+    def record(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        histogram.observe(seconds)
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        """{stage: {"count", "total_ms", "mean_ms", "p50_ms", "p99_ms"}} for every stage recorded so far."""
+        with self.lock:
+            totals, counts, histograms = dict(self.totals), dict(self.counts), dict(self.histograms)
+        return {
+            name: {
+                "count": counts[name],
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total * 1000 / counts[name], 4),
+                "p50_ms": round(histograms[name].quantile(0.5) * 1000, 4),
+                "p99_ms": round(histograms[name].quantile(0.99) * 1000, 4),
+            }
+            for name, total in totals.items()
+        }
+
+    def reset(self):
+        with self.lock:
+            self.totals = {}
+            self.counts = {}
+            self.histograms = {}
+
+def merge_summaries(summaries):
+    """Combine several StageTimer summaries into one (percentiles are not merged)."""
+    merged = {}
+    for summary in summaries:
+        for name, stats in summary.items():
+            entry = merged.setdefault(name, {"count": 0, "total_ms": 0.0})
+            entry["count"] += stats["count"]
+            entry["total_ms"] += stats["total_ms"]
+    for entry in merged.values():
+        entry["total_ms"] = round(entry["total_ms"], 3)
+        entry["mean_ms"] = round(entry["total_ms"] / entry["count"], 4) if entry["count"] else 0.0
+    return merged
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+class MetricsRegistry:
+    """Collects stage timers, histograms and gauge callbacks for export.
+
+    Gauge collectors are callables returning (name, labels, value) tuples; they
+    are only invoked when a snapshot or the Prometheus text is requested.
+    """
+
+    def __init__(self, prefix="ssc"):
+        self.prefix = prefix
+        self.timers = []  # (labels, StageTimer)
+        self.histograms = []  # (name, labels, Histogram)
+        self.collectors = []
+
+    def add_timer(self, timer, **labels):
+        self.timers.append((labels, timer))
+
+    def add_histogram(self, name, histogram, **labels):
+        self.histograms.append((name, labels, histogram))
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def gauges(self):
+        values = []
+        for collector in self.collectors:
+            try:
+                values.extend(collector())
+            except Exception as e:
+                logging.error(f"Metrics collector failed: {e}")
+        return values
+
+    def snapshot(self):
+        """Programmatic view of every metric as plain dicts."""
+        return {
+            "stages": [dict(labels, stages=timer.summary()) for labels, timer in self.timers],
+            "histograms": [dict(labels, name=name, **histogram.summary()) for name, labels, histogram in self.histograms],
+            "gauges": [dict(labels, name=name, value=value) for name, labels, value in self.gauges()],
+        }
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram_lines(name, labels, histogram):
+            buckets, total_sum, total = histogram.cumulative()
+            for bound, count in buckets:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(dict(labels, le=le))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total_sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {total}")
+
+        stage_metric = f"{self.prefix}_stage_seconds"
+        lines.append(f"# HELP {stage_metric} Time spent in each pipeline stage.")
+        lines.append(f"# TYPE {stage_metric} histogram")
+        for labels, timer in self.timers:
+            with timer.lock:
+                histograms = dict(timer.histograms)
+            for stage, histogram in histograms.items():
+                histogram_lines(stage_metric, dict(labels, stage=stage), histogram)
+
+        declared = set()
+        for name, labels, histogram in self.histograms:
+            metric = f"{self.prefix}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            histogram_lines(metric, labels, histogram)
+
+        # Samples of one metric family must be contiguous
+        for name, labels, value in sorted(self.gauges(), key=lambda gauge: gauge[0]):
+            metric = f"{self.prefix}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} gauge")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves /metrics (Prometheus text) and /snapshot (JSON) from a background thread."""
+
+    def __init__(self, registry, host="127.0.0.1", port=9100):
+        self.registry = registry
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry_ref.render_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/snapshot":
+                    body = json.dumps(registry_ref.snapshot()).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would otherwise log a line each
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class RateLimitedLogger:
+    """Logs a message per key at most once every `interval` seconds, counting what was suppressed."""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.last = {}
+        self.suppressed = {}
+
+    def log(self, key, level, message):
+        now = time.monotonic()
+        last = self.last.get(key)
+        if last is not None and now - last < self.interval:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return
+        self.last[key] = now
+        suppressed = self.suppressed.pop(key, 0)
+        if suppressed:
+            message = f"{message} ({suppressed} similar messages suppressed)"
+        logging.log(level, message)
+
+class StartupClock:
+    """Seconds from process start to startup milestones such as the first frame and first detection.
+
+    Each milestone is recorded (and logged) once; later marks are ignored.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.milestones = {}
+
+    def mark(self, name):
+        if name in self.milestones:
+            return  # Cheap check for the per-frame callers
+        with self.lock:
+            if name in self.milestones:
+                return
+            self.milestones[name] = time.monotonic() - self.started
+        logging.info(f"Startup: {name} after {self.milestones[name]:.2f}s")
+
+    def summary(self):
+        with self.lock:
+            return {name: round(seconds, 3) for name, seconds in self.milestones.items()}
+
+# Started when this module is first imported; main.py imports it before anything heavy
+startup_clock = StartupClock()
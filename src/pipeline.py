@@ -0,0 +1,147 @@
+import threading
+import time
+import logging
+from collections import deque
+import cv2
+import numpy as np
+from src.zones import LineZone, zones_for_camera
+from config.config import PROCESSING_FPS, BOUNDARY_COLOR
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def map_points(points, matrix):
+    """Map (N, 2) camera-frame points into view coordinates with a 3x3 matrix."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    return np.round(cv2.perspectiveTransform(points, matrix).reshape(-1, 2)).astype(np.int32)
+
+def draw_overlay(frame, annotations, boundary_y, tiles=None, zones=None):
+    """Draw tracked boxes, labels and each camera's zones onto `frame` in place.
+
+    `tiles` maps camera index -> (camera-to-view matrix, camera frame size) as
+    reported by the compositor, so zones are drawn within each camera's own
+    tile; without it `frame` is treated as camera 0. `zones` maps camera index ->
+    configured zones; other cameras show the default boundary line at `boundary_y`.
+    """
+    bottom_y = None
+    for (x, y, w, h, label) in annotations:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        bottom_y = y + h  # Track the last object's bottom_y
+
+    tiles = tiles or {0: (np.eye(3), (frame.shape[1], frame.shape[0]))}
+    zones = zones or {}
+    for camera, (matrix, (width, _)) in tiles.items():
+        camera_zones = zones.get(camera) or [LineZone("", (0, boundary_y), (width, boundary_y))]
+        for zone in camera_zones:
+            if isinstance(zone, LineZone):
+                points = map_points([zone.start, zone.end], matrix)
+                cv2.line(frame, tuple(points[0].tolist()), tuple(points[1].tolist()), BOUNDARY_COLOR, 2)
+            else:
+                points = map_points(zone.points, matrix)
+                cv2.polylines(frame, [points], True, BOUNDARY_COLOR, 2)
+            if zone.name:
+                x, y = points[0].tolist()
+                cv2.putText(frame, zone.name, (x + 5, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, BOUNDARY_COLOR, 1)
+
+    # Draw BOUNDARY_Y and bottom_y values for debugging
+    cv2.putText(frame, f"BOUNDARY_Y: {boundary_y}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    if bottom_y is not None:
+        cv2.putText(frame, f"Bottom Y: {bottom_y}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return frame
+
+class LatestResult:
+    """One composited, annotated frame and what happened while producing it."""
+
+    def __init__(self, seq, frame, motion_detected, boundary_crossed, annotations):
+        self.seq = seq
+        self.frame = frame
+        self.motion_detected = motion_detected
+        self.boundary_crossed = boundary_crossed
+        self.annotations = annotations
+        self.produced_at = time.monotonic()
+
+class ProcessingPipeline:
+    """Runs CameraManager.process_feeds on its own thread and publishes the newest result.
+
+    Consumers such as the UI read `latest()` at their own rate and never wait for
+    processing. Each published frame is a private copy with the overlay drawn, so
+    the compositor may reuse its canvas for the next result. Events are queued
+    until a consumer drains them, so none are lost between display ticks.
+    """
+
+    def __init__(self, camera_manager, max_fps=PROCESSING_FPS, max_events=1000):
+        self.camera_manager = camera_manager
+        # Configured zones per camera, drawn on every frame (the default line follows settings.boundary_y)
+        self.zones = {i: zones_for_camera(i) for i in range(camera_manager.num_cameras)}
+        self.min_period = 1.0 / max_fps if max_fps else 0.0
+        self.lock = threading.Lock()
+        self.result = None
+        self.seq = 0
+        self.events = deque(maxlen=max_events)
+        self.processed = 0
+        self.errors = 0
+        self.active = threading.Event()  # Cleared while paused
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="processing", daemon=True)
+
+    def start(self):
+        self.active.set()
+        if not self.thread.is_alive():
+            self.thread.start()
+            logging.info("Processing pipeline started")
+
+    def pause(self):
+        self.active.clear()
+
+    @property
+    def paused(self):
+        return not self.active.is_set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.active.set()  # Wake the thread if it is paused
+        if self.thread.is_alive():
+            self.thread.join(timeout=5.0)
+
+    def latest(self):
+        """The newest LatestResult, or None before the first frame."""
+        with self.lock:
+            return self.result
+
+    def drain_events(self):
+        """Events published since the last call, oldest first."""
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+        return events
+
+    def _run(self):
+        manager = self.camera_manager
+        while not self.stop_event.is_set():
+            if not self.active.wait(timeout=0.1):
+                continue
+            loop_start = time.monotonic()
+            try:
+                frame, motion_detected, boundary_crossed, annotations = manager.process_feeds()
+                events = manager.events
+                if frame is not None:
+                    frame = frame.copy()  # The compositor canvas is rewritten on the next call
+                    draw_overlay(frame, annotations, manager.settings.boundary_y, manager.view_tiles, self.zones)
+                with self.lock:
+                    self.events.extend(events)
+                    if frame is not None:
+                        self.seq += 1
+                        self.result = LatestResult(self.seq, frame, motion_detected, boundary_crossed, annotations)
+                self.processed += 1
+                idle = not manager.results_collected
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Error in processing pipeline: {e}")
+                idle = True
+
+            if idle:
+                manager.wait_for_results()
+                continue
+            remaining = self.min_period - (time.monotonic() - loop_start)
+            if remaining > 0:
+                time.sleep(remaining)
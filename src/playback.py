@@ -0,0 +1,73 @@
+import queue
+import threading
+import time
+import logging
+import cv2
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class ClipPlayer:
+    """Decodes a clip on a background thread, starting at a given frame.
+
+    The start is reached with one seek instead of decoding from the beginning.
+    Frames are paced at the clip's FPS and handed over through a small queue, so
+    a UI can poll `get_frame` from its own thread without blocking.
+    """
+
+    def __init__(self, path, start_frame=0, fps=None, queue_size=4):
+        self.path = path
+        self.start_frame = max(int(start_frame), 0)
+        self.fps = fps
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self.finished = False
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="playback", daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=2.0)
+
+    def get_frame(self):
+        """The next frame if one is due, else None."""
+        try:
+            return self.frames.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.path)
+        try:
+            if not cap.isOpened():
+                self.error = f"Failed to open video: {self.path}"
+                logging.error(self.error)
+                return
+            if self.start_frame:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+            fps = self.fps or cap.get(cv2.CAP_PROP_FPS) or 20.0
+            period = 1.0 / fps
+            next_due = time.monotonic()
+            while self.running:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                while self.running:
+                    try:
+                        self.frames.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                next_due += period
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_due = time.monotonic()  # Fell behind; do not try to catch up
+        finally:
+            cap.release()
+            self.finished = True
@@ -1,60 +1,274 @@
-import cv2
 from datetime import datetime
-from config.config import OUTPUT_DIR, COMPRESSED_DIR, FOURCC, FPS, BUFFER_SIZE
-from src.utilities import compress_video
+from config.config import OUTPUT_DIR, COMPRESSED_DIR, FOURCC, FPS, BUFFER_SIZE, BUFFER_COMPRESSED, BUFFER_JPEG_QUALITY, \
+    DIRECT_MP4, MP4_FOURCC, EVENT_STORE_ENABLED, BUFFER_SECONDS, RECORDER_MIN_FPS, ADAPTIVE_EWMA_ALPHA, \
+    RECORDER_EXTEND_ON_DETECTION, RECORDER_MAX_CLIP_SECONDS, RECORDER_MERGE_GAP_SECONDS
+from src.clip_writer import ClipWriter
+from src.metrics import StageTimer
+from src.frame_buffer import FrameRingBuffer, CompressedFrameBuffer
+from src.runtime_config import get_runtime_config
+from src.event_store import get_event_store, encode_thumbnail
+import itertools
 import logging
-from collections import deque
 import os
+import sqlite3
+import time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class Recorder:
-    def __init__(self):
-        self.recording = False
-        self.out = None
+    """Writes event clips from a camera's frames, driven by `update` once per processed frame.
+
+    States:
+      idle      -- frames only go to the pre-event buffer; a trigger starts a clip
+                   with up to BUFFER_SECONDS of pre-roll.
+      recording -- frames are written. The post-roll (post_roll_seconds) restarts
+                   on every trigger and, with RECORDER_EXTEND_ON_DETECTION, on every
+                   frame with detections. When it runs out the recorder lingers.
+      lingering -- frames are held back in the buffer for up to
+                   RECORDER_MERGE_GAP_SECONDS. A trigger in that window writes the
+                   held frames and continues the same clip; otherwise the clip is
+                   closed where its post-roll ended.
+    A clip is also closed when it reaches RECORDER_MAX_CLIP_SECONDS.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR, compressed_dir=COMPRESSED_DIR, settings=None, camera_index=0, events=None):
+        self.output_dir = output_dir
+        self.compressed_dir = compressed_dir
+        self.camera_index = camera_index
+        self._events = events  # Defaults to the shared store, opened on the first recording
+        self.event_id = None
+        self.settings = settings if settings is not None else get_runtime_config()
+        self.timer = StageTimer()  # Shared with this recorder's clip writers
+        self.state = "idle"
+        self.writer = None
+        self.closed_writers = []  # Writers still flushing their queue
+        self.frames_dropped = 0  # Frames dropped by finished clips' writers
         self.timestamp = None
-        self.buffer = deque(maxlen=BUFFER_SIZE)  # Buffer for 3 seconds of frames
-        self.post_crossing_frames = 0  # Counter for frames after crossing
-        self.frames_to_record_after = BUFFER_SIZE  # 3 seconds after crossing
+        # Buffer for 3 seconds of frames
+        if BUFFER_COMPRESSED:
+            self.buffer = CompressedFrameBuffer(BUFFER_SIZE, BUFFER_JPEG_QUALITY)
+        else:
+            self.buffer = FrameRingBuffer(BUFFER_SIZE)
+        self.frames_in_clip = 0  # Frames written to the current clip, pre-roll included
+        self.last_activity = 0  # Value of frames_in_clip at the last trigger or detection
+        self.held_frames = 0  # Frames held back while lingering
+        self.linger_started_at = None
+        self.clips_merged = 0
+        self.clip_fps = FPS  # Frame rate of the current clip
+        # Rate frames actually arrive at; clips are written at this rate so their duration is real time
+        self.measured_fps = FPS
+        self.last_frame_at = None
 
     def add_to_buffer(self, frame, annotations):
         """Add a frame and its annotations to the buffer."""
-        self.buffer.append((frame.copy(), annotations))
+        now = time.monotonic()
+        if self.last_frame_at is not None and now > self.last_frame_at:
+            rate = 1.0 / (now - self.last_frame_at)
+            self.measured_fps = ADAPTIVE_EWMA_ALPHA * rate + (1 - ADAPTIVE_EWMA_ALPHA) * self.measured_fps
+        self.last_frame_at = now
+        self.buffer.append(frame, annotations)
+
+    @property
+    def events(self):
+        """Event store every clip is indexed in, or None when EVENT_STORE_ENABLED is off."""
+        if self._events is None and EVENT_STORE_ENABLED:
+            self._events = get_event_store()
+        return self._events
+
+    @property
+    def recording(self):
+        """True while a clip is open, including while lingering for a merge."""
+        return self.state != "idle"
+
+    @property
+    def frames_to_record_after(self):
+        """Post-roll frames after the last activity: the runtime post_roll_seconds at the clip's frame rate."""
+        return max(1, round(self.settings.post_roll_seconds * self.clip_fps))
+
+    @property
+    def max_clip_frames(self):
+        return max(1, round(RECORDER_MAX_CLIP_SECONDS * self.clip_fps))
+
+    @property
+    def merge_gap_frames(self):
+        # Held frames must still be in the buffer when the clip resumes
+        return min(BUFFER_SIZE, round(RECORDER_MERGE_GAP_SECONDS * self.clip_fps))
+
+    def update(self, frame, annotations, active=False, trigger_events=()):
+        """Advance the state machine by one frame that was already passed to add_to_buffer.
+
+        `active` means objects were detected in this frame and `trigger_events` are
+        the zone events of a triggering crossing, empty if there was none. Returns
+        "started", "extended", "merged" or None.
+        """
+        triggered = bool(trigger_events)
+        if self.state == "idle":
+            if triggered:
+                self.start_recording(frame, trigger_events)
+                return "started"
+            return None
+
+        if self.state == "lingering":
+            self.held_frames += 1
+            if triggered:
+                self._resume(trigger_events)
+                return "merged"
+            if self.held_frames >= self.merge_gap_frames:
+                self.stop_recording()
+            return None
+
+        self.record_frame(frame, annotations)
+        if self.frames_in_clip >= self.max_clip_frames:
+            logging.info(f"Camera {self.camera_index}: clip reached {RECORDER_MAX_CLIP_SECONDS}s limit")
+            self.stop_recording()
+            if triggered:
+                self.start_recording(frame, trigger_events)
+                return "started"
+            return None
+        if triggered or (active and RECORDER_EXTEND_ON_DETECTION):
+            self.last_activity = self.frames_in_clip
+            if triggered:
+                self._add_labels(trigger_events)
+                return "extended"
+        elif self.frames_in_clip - self.last_activity >= self.frames_to_record_after:
+            if self.merge_gap_frames > 0:
+                self.state = "lingering"
+                self.held_frames = 0
+                self.linger_started_at = time.time()
+            else:
+                self.stop_recording()
+        return None
 
-    def start_recording(self, frame):
-        if not self.recording:
-            self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = f"{OUTPUT_DIR}/crossing_{self.timestamp}.avi"
-            self.out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*FOURCC), FPS, 
-                                      (frame.shape[1], frame.shape[0]))
-            self.recording = True
-            logging.info(f"Started recording: {output_path}")
+    @property
+    def buffer_nbytes(self):
+        """Memory held by the pre-event buffer, in bytes."""
+        return self.buffer.nbytes
 
-            # Write buffered frames (3 seconds before crossing)
-            for buffered_frame, buffered_annotations in self.buffer:
-                self.record_frame(buffered_frame, buffered_annotations)
+    def start_recording(self, frame, trigger_events=()):
+        """Start a clip with the buffered pre-roll; `trigger_events` are the zone events that caused it."""
+        if self.state == "idle":
+            started_at = datetime.now()
+            self.timestamp = started_at.strftime("%Y%m%d_%H%M%S")
+            # Camera and milliseconds keep names unique when several clips start in the same second
+            name = f"crossing_{self.timestamp}_{started_at.microsecond // 1000:03d}_cam{self.camera_index}"
+            frame_size = (frame.shape[1], frame.shape[0])
+            if DIRECT_MP4:
+                # Encode straight to the final H.264 file; no second pass needed
+                output_path = f"{self.compressed_dir}/{name}.mp4"
+                compressed_path = None
+                fourcc = MP4_FOURCC
+                os.makedirs(self.compressed_dir, exist_ok=True)
+            else:
+                output_path = f"{self.output_dir}/{name}.avi"
+                compressed_path = f"{self.compressed_dir}/{name}.mp4"
+                fourcc = FOURCC
+            fallback_path = f"{self.output_dir}/{name}.avi"  # Used if `fourcc` cannot be opened
+            # Write at the rate frames really arrive, so the clip plays back in real time
+            self.clip_fps = round(max(RECORDER_MIN_FPS, self.measured_fps), 2)
+            pre_roll = min(len(self.buffer), max(1, round(BUFFER_SECONDS * self.clip_fps)))
+
+            # The triggering frame is the newest buffered one, so playback can seek straight to it
+            trigger = next((event for event in trigger_events if event["type"] == "crossing"),
+                           trigger_events[0] if trigger_events else {})
+            self.event_id = self._index(lambda: self.events.start_event(
+                self.camera_index, output_path, self.clip_fps, started_at=started_at.timestamp(),
+                direction=trigger.get("direction"), zone=trigger.get("zone"),
+                labels=[event["label"] for event in trigger_events],
+                trigger_frame=max(pre_roll - 1, 0), thumbnail=encode_thumbnail(frame)))
+
+            self.writer = ClipWriter(output_path, frame_size, self.clip_fps, fourcc, self.timestamp, compressed_path,
+                                     timer=self.timer, fallback_path=fallback_path,
+                                     **self._index_callbacks(self.event_id))
+            self.state = "recording"
+            self.frames_in_clip = 0
+            logging.info(f"Started recording: {output_path} at {self.clip_fps} fps")
+
+            # Write buffered frames (3 seconds before crossing); the post-roll counts from the trigger
+            self._write_buffered(pre_roll)
+            self.last_activity = self.frames_in_clip
+
+    def _write_buffered(self, count):
+        """Write the newest `count` buffered frames to the clip."""
+        for buffered_frame, buffered_annotations in itertools.islice(self.buffer, len(self.buffer) - count, None):
+            self.record_frame(buffered_frame, buffered_annotations)
+
+    def _resume(self, trigger_events):
+        """Continue a lingering clip: write the held-back frames, then record as normal."""
+        self._write_buffered(min(self.held_frames, len(self.buffer)))
+        self.state = "recording"
+        self.last_activity = self.frames_in_clip
+        self.clips_merged += 1
+        self._add_labels(trigger_events)
+        logging.info(f"Camera {self.camera_index}: new trigger after {self.held_frames} frames, continuing "
+                     f"{self.writer.path}")
+
+    def _add_labels(self, trigger_events):
+        if self.event_id is not None:
+            event_id = self.event_id
+            labels = [event["label"] for event in trigger_events]
+            self._index(lambda: self.events.add_labels(event_id, labels))
 
     def stop_recording(self):
-        if self.recording:
-            self.recording = False
-            self.out.release()
-            self.out = None
-            self.post_crossing_frames = 0
-            input_path = f"{OUTPUT_DIR}/crossing_{self.timestamp}.avi"
-            logging.info(f"Stopped recording: {input_path}")
-            # Compress the video
-            output_path = f"{COMPRESSED_DIR}/crossing_{self.timestamp}.mp4"
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            compress_video(input_path, output_path)
-            logging.info(f"Compressed video saved: {output_path}")
+        """Close the current clip; writing and compression finish in the background."""
+        if self.state != "idle":
+            # A lingering clip's last frame was written when the post-roll ran out
+            ended_at = self.linger_started_at if self.state == "lingering" else None
+            self.state = "idle"
+            self.writer.close()
+            # Pruned here, on the thread that owns the list; get_stats only reads it
+            self.closed_writers = [writer for writer in self.closed_writers if writer.thread.is_alive()]
+            self.closed_writers.append(self.writer)
+            if self.event_id is not None:
+                event_id = self.event_id
+                self._index(lambda: self.events.finish_event(event_id, ended_at))
+                self.event_id = None
+            self.frames_dropped += self.writer.frames_dropped
+            logging.info(f"Stopped recording: {self.writer.path}")
+            self.writer = None
 
     def record_frame(self, frame, annotations):
-        if self.recording:
-            for (x, y, w, h, label) in annotations:
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            cv2.putText(frame, f"Recording: {self.timestamp}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            self.out.write(frame)
-            self.post_crossing_frames += 1
-            if self.post_crossing_frames >= self.frames_to_record_after:
-                self.stop_recording()
\ No newline at end of file
+        if self.writer is not None:
+            self.writer.write(frame, annotations)
+            self.frames_in_clip += 1
+
+    def _index(self, operation):
+        """Run an event store write; indexing problems are logged and never stop a recording."""
+        if self.events is None:
+            return None
+        try:
+            return operation()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to index recording for camera {self.camera_index}: {e}")
+            return None
+
+    def _index_callbacks(self, event_id):
+        """ClipWriter callbacks that fill in the event's frame count and compressed path once known."""
+        if event_id is None:
+            return {}
+        return {
+            "on_written": lambda writer: self._index(
+                lambda: self.events.update_event(event_id, frames=writer.frames_written, clip_path=writer.path)),
+            "on_compressed": lambda writer: self._index(
+                lambda: self.events.update_event(event_id, compressed_path=writer.compress_to)),
+        }
+
+    def get_stats(self):
+        """Writer backpressure counters for this camera; safe to call from another thread."""
+        writer = self.writer
+        dropped = self.frames_dropped + (writer.frames_dropped if writer is not None else 0)
+        return {
+            "recording": self.recording,
+            "recorder_state": self.state,
+            "clips_merged": self.clips_merged,
+            "measured_fps": round(self.measured_fps, 2),
+            "writer_queue_depth": writer.queue_depth() if writer is not None else 0,
+            "writer_frames_dropped": dropped,
+            "writers_finishing": sum(closed.thread.is_alive() for closed in list(self.closed_writers)),
+        }
+
+    def close(self):
+        """Stop recording and wait for every pending clip to be written."""
+        self.stop_recording()
+        for writer in self.closed_writers:
+            writer.join()
+        self.closed_writers = []
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import logging
+from config.config import BOUNDARY_Y, MIN_AREA, THRESHOLD, DETECTION_CONFIDENCE, DETECTION_CLASSES, BUFFER_SECONDS, \
+    RUNTIME_CONFIG_POLL
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def _non_negative_int(value):
+    value = int(value)
+    if value < 0:
+        raise ValueError(f"{value} is negative")
+    return value
+
+def _non_negative_float(value):
+    value = float(value)
+    if value < 0:
+        raise ValueError(f"{value} is negative")
+    return value
+
+def _threshold(value):
+    value = int(value)
+    if not 0 <= value <= 255:
+        raise ValueError(f"{value} is outside 0-255")
+    return value
+
+def _confidence(value):
+    value = float(value)
+    if not 0.0 <= value <= 1.0:
+        raise ValueError(f"{value} is outside 0-1")
+    return value
+
+def _classes(value):
+    if isinstance(value, str):
+        value = [value]
+    return frozenset(str(label).capitalize() for label in value)
+
+# Setting name -> parser that validates and normalizes a new value
+SETTINGS = {
+    "boundary_y": int,
+    "min_area": _non_negative_int,
+    "threshold": _threshold,
+    "confidence": _confidence,
+    "classes": _classes,
+    "post_roll_seconds": _non_negative_float,
+}
+
+class RuntimeConfig:
+    """Detection and recording settings that can change while the pipeline runs.
+
+    Processors and recorders hold a reference and read attributes on every frame,
+    so an update takes effect on the next frame without reinitializing anything.
+    `version` increases with every change so other processes can be kept in sync.
+    """
+
+    def __init__(self, **values):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.boundary_y = BOUNDARY_Y
+        self.min_area = MIN_AREA
+        self.threshold = THRESHOLD
+        self.confidence = DETECTION_CONFIDENCE
+        self.classes = _classes(DETECTION_CLASSES)
+        self.post_roll_seconds = BUFFER_SECONDS
+        if values:
+            self.update(**values)
+
+    def update(self, **changes):
+        """Validate and apply changes atomically; raises ValueError and applies nothing if any is invalid."""
+        parsed = {}
+        for name, value in changes.items():
+            if name not in SETTINGS:
+                raise ValueError(f"Unknown setting: {name}")
+            try:
+                parsed[name] = SETTINGS[name](value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid value for {name}: {e}")
+        with self.lock:
+            changed = {name: value for name, value in parsed.items() if getattr(self, name) != value}
+            for name, value in changed.items():
+                setattr(self, name, value)
+            if changed:
+                self.version += 1
+        if changed:
+            logging.info(f"Runtime settings updated: {self.describe(changed)}")
+        return changed
+
+    def values(self):
+        with self.lock:
+            return {name: getattr(self, name) for name in SETTINGS}
+
+    @staticmethod
+    def describe(values):
+        return ", ".join(f"{name}={sorted(value) if isinstance(value, frozenset) else value}"
+                         for name, value in values.items())
+
+_runtime_config = None
+_config_lock = threading.Lock()
+
+def get_runtime_config():
+    """Process-wide settings object shared by every processor and recorder."""
+    global _runtime_config
+    with _config_lock:
+        if _runtime_config is None:
+            _runtime_config = RuntimeConfig()
+        return _runtime_config
+
+class ConfigWatcher:
+    """Polls a JSON file of settings and applies it to a RuntimeConfig whenever it changes.
+
+    Invalid files are logged and ignored; the previous settings stay in effect.
+    """
+
+    def __init__(self, config, path, interval=RUNTIME_CONFIG_POLL):
+        self.config = config
+        self.path = path
+        self.interval = interval
+        self.last_mtime = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+
+    def start(self):
+        self.check()
+        self.thread.start()
+        logging.info(f"Watching {self.path} for settings changes")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def check(self):
+        """Apply the file if it was modified since the last check; returns True if it was read."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.last_mtime:
+            return False
+        self.last_mtime = mtime
+        try:
+            with open(self.path) as f:
+                values = json.load(f)
+            if not isinstance(values, dict):
+                raise ValueError("expected a JSON object")
+            self.config.update(**values)
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring settings file {self.path}: {e}")
+        return True
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
@@ -0,0 +1,322 @@
+import multiprocessing as mp
+import queue
+import time
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+from src.metrics import startup_clock, RateLimitedLogger
+from config.config import SHARD_RING_SLOTS, SHARD_SLOT_BYTES, SHARD_RESULT_QUEUE, SHARD_RESTART_BACKOFF, \
+    SHARD_RESTART_MAX_BACKOFF, SHARD_START_METHOD, DETECTOR_BACKEND
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class SharedFrameRing:
+    """Fixed slots of frame bytes in a multiprocessing.shared_memory block.
+
+    Each slot has an int64 header used as a sequence lock: the writer sets it to
+    2 * seq + 1 while copying and 2 * seq + 2 when done, so a reader can detect a
+    slot that was overwritten (or was being written) while it copied the frame out.
+    """
+
+    def __init__(self, slots, slot_bytes, name=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        size = slots * 8 + slots * slot_bytes
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            # Workers share the coordinator's resource tracker, so attaching does not
+            # hand ownership over: only the coordinator unlinks the block.
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.headers = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=self.shm.buf, offset=slots * 8)
+        if self.owner:
+            self.headers[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, seq, frame):
+        frame = np.ascontiguousarray(frame)
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {frame.nbytes} bytes does not fit a {self.slot_bytes} byte slot")
+        slot = seq % self.slots
+        self.headers[slot] = 2 * seq + 1
+        self.data[slot, :frame.nbytes] = frame.reshape(-1).view(np.uint8)
+        self.headers[slot] = 2 * seq + 2
+
+    def read(self, seq, shape, dtype=np.uint8):
+        """Copy frame `seq` out of its slot, or return None if it has been overwritten."""
+        slot = seq % self.slots
+        expected = 2 * seq + 2
+        if self.headers[slot] != expected:
+            return None
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        frame = self.data[slot, :nbytes].copy().view(dtype).reshape(shape)
+        if self.headers[slot] != expected:
+            return None
+        return frame
+
+    def close(self):
+        self.headers = None
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _put_until_stopped(results, message, stop_event, timeout=0.1):
+    """Queue a message that must not be dropped; gives up (returning False) only once `stop_event` is set."""
+    while not stop_event.is_set():
+        try:
+            results.put(message, timeout=timeout)
+            return True
+        except queue.Full:
+            continue  # The coordinator is not draining (e.g. paused); keep checking for stop
+    return False
+
+def shard_worker(shard_id, cameras, ring_names, results, control, stop_event, detector_backend=DETECTOR_BACKEND):
+    """Worker process: owns the VideoProcessors for `cameras` and publishes results.
+
+    Frames go into the camera's shared-memory ring; only small metadata is
+    pickled onto the `results` queue. Runtime settings arrive on `control`.
+    When a camera's frames outgrow its slots (e.g. portrait or a resolution
+    change), the worker creates a larger ring and sends its name ahead of the
+    first frame written to it.
+    """
+    from src.detector import get_shared_detector
+    from src.runtime_config import get_runtime_config
+    from src.video_processor import VideoProcessor, process_batch
+    from src.adaptive import frame_budget
+
+    logging.info(f"Shard {shard_id} starting with cameras {[i for i, _ in cameras]}")
+    rings = {i: SharedFrameRing(SHARD_RING_SLOTS, SHARD_SLOT_BYTES, ring_names[i]) for i, _ in cameras}
+    retired = []  # Grown-out rings the coordinator may still be reading; unlinked on exit
+    log = RateLimitedLogger()
+    detector = get_shared_detector(detector_backend)
+    settings = get_runtime_config()
+    budget = frame_budget(len(cameras))  # The shard processes its cameras serially
+    processors = {i: VideoProcessor(source, detector, i, settings, budget) for i, source in cameras}
+    seq = {i: 0 for i in processors}
+    last_stats = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            while True:
+                try:
+                    settings.update(**control.get_nowait())
+                except queue.Empty:
+                    break
+
+            items = []
+            captured = {}
+            for i, processor in processors.items():
+                ret, frame = processor.cap.read()  # Reconnects on its own after repeated failures
+                if not ret or not processor.accept_frame():
+                    continue
+                captured[i] = time.monotonic()
+                items.append((i, processor, frame))
+
+            if not items:
+                time.sleep(0.01)
+                continue
+
+            for i, frame, detected, crossed, annotations, zone_events in process_batch(detector, items):
+                if frame.nbytes > rings[i].slot_bytes:
+                    try:
+                        ring = SharedFrameRing(SHARD_RING_SLOTS, frame.nbytes)
+                    except OSError as e:
+                        log.log(f"ring-{i}", logging.ERROR,
+                                f"Shard {shard_id}, camera {i}: cannot allocate a ring for {frame.shape} frames: {e}")
+                        continue
+                    retired.append(rings[i])
+                    rings[i] = ring
+                    if not _put_until_stopped(results, ("ring", i, ring.name, ring.slot_bytes), stop_event):
+                        break
+                    logging.info(f"Shard {shard_id}, camera {i}: frame ring grown to {ring.slot_bytes} bytes "
+                                 f"per slot for {frame.shape} frames")
+                rings[i].write(seq[i], frame)
+                try:
+                    results.put_nowait(("frame", i, seq[i], frame.shape, detected, crossed, annotations, zone_events,
+                                        captured[i]))
+                except queue.Full:
+                    pass  # The coordinator sees the sequence gap and counts it as dropped
+                seq[i] += 1
+
+            now = time.monotonic()
+            if now - last_stats >= 1.0:
+                last_stats = now
+                stats = {i: (processor.get_stats(), processor.timer.summary()) for i, processor in processors.items()}
+                try:
+                    results.put_nowait(("stats", shard_id, stats))
+                except queue.Full:
+                    pass
+    finally:
+        for processor in processors.values():
+            processor.release()
+        for ring in list(rings.values()) + retired:
+            ring.close()
+        logging.info(f"Shard {shard_id} stopped")
+
+class ShardPool:
+    """Spreads cameras over worker processes and supervises them.
+
+    Camera i runs on worker i % num_workers. Dead workers are restarted with
+    exponential backoff; sources reconnect by themselves (ResilientCapture).
+    Changes to `settings` are forwarded to every worker. Each worker loads its
+    own `detector_backend` (see create_backend).
+    """
+
+    def __init__(self, sources, num_workers, settings, detector_backend=DETECTOR_BACKEND):
+        self.settings = settings
+        self.detector_backend = detector_backend
+        self.context = mp.get_context(SHARD_START_METHOD)
+        self.num_cameras = len(sources)
+        self.num_workers = min(num_workers, len(sources))
+        self.own_rings = [SharedFrameRing(SHARD_RING_SLOTS, SHARD_SLOT_BYTES) for _ in sources]
+        self.ring_names = {i: ring.name for i, ring in enumerate(self.own_rings)}
+        self.rings = list(self.own_rings)  # The ring each camera's frames are read from; workers may grow it
+        self.results = self.context.Queue(maxsize=SHARD_RESULT_QUEUE)
+        self.stop_event = self.context.Event()
+        self.control = [self.context.Queue() for _ in range(self.num_workers)]
+        self.synced_version = [None] * self.num_workers
+        self.assignments = [[(i, source) for i, source in enumerate(sources) if i % self.num_workers == w]
+                            for w in range(self.num_workers)]
+        self.workers = [None] * self.num_workers
+        self.restarts = [0] * self.num_workers
+        self.restart_at = [None] * self.num_workers
+
+        self.peeked = []  # Messages taken off the queue by wait(), handled by the next collect()
+        self.received = [0] * self.num_cameras
+        self.dropped = [0] * self.num_cameras
+        self.last_seq = [-1] * self.num_cameras
+        self.worker_stats = [{} for _ in sources]
+        self.stage_summaries = [{} for _ in sources]
+        for w in range(self.num_workers):
+            self._start_worker(w)
+
+    def _start_worker(self, w):
+        # A new worker starts from the coordinator's rings again; a dead worker's grown ring is orphaned
+        for i, _ in self.assignments[w]:
+            self._use_ring(i, self.own_rings[i], unlink=True)
+        process = self.context.Process(target=shard_worker, name=f"shard-{w}", daemon=True,
+                                       args=(w, self.assignments[w], self.ring_names, self.results, self.control[w],
+                                             self.stop_event, self.detector_backend))
+        process.start()
+        self.workers[w] = process
+        self.synced_version[w] = None
+        logging.info(f"Started shard worker {w} (pid {process.pid}) for cameras {[i for i, _ in self.assignments[w]]}")
+
+    def _use_ring(self, i, ring, unlink=False):
+        if self.rings[i] is not self.own_rings[i]:
+            if unlink:
+                try:
+                    self.rings[i].shm.unlink()
+                except FileNotFoundError:
+                    pass  # The worker exited cleanly and unlinked it
+            self.rings[i].close()
+        self.rings[i] = ring
+
+    def supervise(self):
+        """Restart workers that have died, backing off after repeated failures, and push settings changes."""
+        if self.stop_event.is_set():
+            return
+        now = time.monotonic()
+        version = self.settings.version
+        for w, process in enumerate(self.workers):
+            if process.is_alive():
+                if self.synced_version[w] != version:
+                    self.control[w].put(self.settings.values())
+                    self.synced_version[w] = version
+                continue
+            if self.restart_at[w] is None:
+                delay = min(SHARD_RESTART_MAX_BACKOFF, SHARD_RESTART_BACKOFF * 2 ** self.restarts[w])
+                self.restart_at[w] = now + delay
+                logging.error(f"Shard worker {w} exited with code {process.exitcode}, restarting in {delay:.1f}s")
+            elif now >= self.restart_at[w]:
+                self.restart_at[w] = None
+                self.restarts[w] += 1
+                process.join(timeout=0)
+                self._start_worker(w)
+
+    def wait(self, timeout):
+        """Block until a worker publishes something or `timeout` seconds pass."""
+        if self.peeked:
+            return
+        try:
+            self.peeked.append(self.results.get(timeout=timeout))
+        except queue.Empty:
+            pass
+
+    def collect(self):
+        """Drain finished results without blocking.
+
+        Returns (camera, frame, motion_detected, boundary_crossed, annotations,
+        zone events, captured_at) tuples, oldest first.
+        """
+        self.supervise()
+        collected = []
+        while True:
+            if self.peeked:
+                message = self.peeked.pop(0)
+            else:
+                try:
+                    message = self.results.get_nowait()
+                except queue.Empty:
+                    break
+            if message[0] == "stats":
+                for i, (stats, stages) in message[2].items():
+                    self.worker_stats[i] = stats
+                    self.stage_summaries[i] = stages
+                    if stats.get("detections"):
+                        startup_clock.mark("first_detection")  # Workers report once a second
+                continue
+            if message[0] == "ring":
+                _, i, name, slot_bytes = message
+                try:
+                    self._use_ring(i, SharedFrameRing(SHARD_RING_SLOTS, slot_bytes, name))
+                except FileNotFoundError:
+                    logging.error(f"Frame ring for camera {i} disappeared before it could be attached")
+                continue
+
+            _, i, seq, shape, detected, crossed, annotations, zone_events, captured_at = message
+            if seq > self.last_seq[i] + 1:
+                self.dropped[i] += seq - self.last_seq[i] - 1
+            self.last_seq[i] = seq  # A restarted worker starts again from 0
+            frame = self.rings[i].read(seq, shape)
+            if frame is None:
+                self.dropped[i] += 1
+                continue
+            self.received[i] += 1
+            collected.append((i, frame, detected, crossed, annotations, zone_events, captured_at))
+        return collected
+
+    def get_camera_stats(self, i):
+        w = i % self.num_workers
+        stats = dict(self.worker_stats[i])
+        stats.update({
+            "shard": w,
+            "shard_alive": int(self.workers[w].is_alive()),
+            "shard_restarts": self.restarts[w],
+            "shard_frames_received": self.received[i],
+            "shard_frames_dropped": self.dropped[i],
+        })
+        return stats
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.workers:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        # Drain so the queue's feeder thread can exit
+        while True:
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                break
+        for i, ring in enumerate(self.own_rings):
+            self._use_ring(i, ring)
+            ring.close()
@@ -0,0 +1,156 @@
+import time
+import cv2
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class SyntheticSource:
+    """Deterministic stand-in for cv2.VideoCapture that draws moving white boxes.
+
+    Objects move vertically across the frame so they cross the boundary line.
+    Pair it with `synthetic_detections` as a stub detector to run the whole
+    pipeline without a camera or a model.
+    """
+
+    def __init__(self, width=640, height=480, num_objects=2, num_frames=None, fps=20.0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.num_frames = num_frames
+        self.frame_index = 0
+        self.opened = True
+        self.background = rng.integers(30, 90, size=(height, width, 3), dtype=np.uint8)
+        self.background = cv2.GaussianBlur(self.background, (15, 15), 0)
+        self.sizes = (rng.uniform(0.05, 0.1, size=(num_objects, 2)) * [width, height * 2]).astype(int)
+        self.x = rng.uniform(0, width - self.sizes[:, 0].max(), size=num_objects).astype(int)
+        self.y0 = rng.uniform(0, height, size=num_objects)
+        self.speed = rng.uniform(2, 6, size=num_objects) * height / 480
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.opened or (self.num_frames is not None and self.frame_index >= self.num_frames):
+            return False, None
+        frame = self.background.copy()
+        span = self.height + self.sizes[:, 1]
+        y = ((self.y0 + self.speed * self.frame_index) % span - self.sizes[:, 1]).astype(int)
+        for x, top, (w, h) in zip(self.x, y, self.sizes):
+            cv2.rectangle(frame, (int(x), int(top)), (int(x + w), int(top + h)), (255, 255, 255), -1)
+        self.frame_index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_index)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.opened = False
+
+class ReplaySource:
+    """Replays a video file, looping at the end, with the cv2.VideoCapture interface."""
+
+    def __init__(self, path, loop=True):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Failed to open video file: {path}")
+
+    def __getstate__(self):
+        # Reopened on unpickling, so a replay source can be handed to a shard worker
+        return {"path": self.path, "loop": self.loop}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["loop"])
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+class FlakySource:
+    """Wraps another source and drops out on a schedule, to exercise reconnect handling.
+
+    After `fail_after` good reads the source goes down for `outage` seconds: reads
+    fail and isOpened() is False. With `stall`, each read while down first blocks
+    that many seconds, like a network stream that stops answering. The drop repeats
+    `drops` times (None = forever).
+    """
+
+    def __init__(self, inner, fail_after=100, outage=2.0, stall=0.0, drops=1):
+        self.inner = inner
+        self.fail_after = fail_after
+        self.outage = outage
+        self.stall = stall
+        self.drops_left = drops
+        self.good_reads = 0
+        self.down_until = None
+
+    def _down(self):
+        if self.down_until is not None and time.monotonic() >= self.down_until:
+            self.down_until = None
+            self.good_reads = 0
+        return self.down_until is not None
+
+    def isOpened(self):
+        return not self._down() and self.inner.isOpened()
+
+    def read(self):
+        if self._down():
+            if self.stall:
+                time.sleep(self.stall)
+            return False, None
+        if self.good_reads >= self.fail_after and self.drops_left != 0:
+            self.down_until = time.monotonic() + self.outage
+            if self.drops_left is not None:
+                self.drops_left -= 1
+            return False, None
+        self.good_reads += 1
+        return self.inner.read()
+
+    def get(self, prop):
+        return self.inner.get(prop)
+
+    def set(self, prop, value):
+        return self.inner.set(prop, value)
+
+    def release(self):
+        self.inner.release()
+
+def synthetic_detections(frame, cls=0, conf=0.9):
+    """Stub detector for synthetic video: every near-white blob is reported as a person."""
+    mask = cv2.inRange(frame, (230, 230, 230), (255, 255, 255))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    rows = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h >= 16:
+            rows.append((x, y, x + w, y + h, conf, cls))
+    return rows
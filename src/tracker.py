@@ -0,0 +1,127 @@
+import numpy as np
+import logging
+from collections import deque
+from config.config import TRACK_IOU_THRESHOLD, TRACK_MAX_DISTANCE, TRACK_MAX_MISSED, TRACK_HISTORY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return intersection / np.maximum(union, 1e-6)
+
+def centroid_distance_matrix(a, b):
+    ca = np.stack(((a[:, 0] + a[:, 2]) / 2, (a[:, 1] + a[:, 3]) / 2), axis=1)
+    cb = np.stack(((b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2), axis=1)
+    return np.linalg.norm(ca[:, None, :] - cb[None, :, :], axis=2)
+
+class Track:
+    """One tracked object with its own trajectory."""
+
+    def __init__(self, track_id, box, label):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.label = label
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.trajectory = deque(maxlen=TRACK_HISTORY)  # Bottom-centre points, oldest first
+        self.misses = 0
+        self.hits = 1
+        self.record_position()
+
+    @property
+    def bottom_y(self):
+        return float(self.box[3])
+
+    def record_position(self):
+        self.trajectory.append(((self.box[0] + self.box[2]) / 2, self.box[3]))
+
+    def annotation(self):
+        x1, y1, x2, y2 = [int(v) for v in self.box]
+        return (x1, y1, x2 - x1, y2 - y1, f"{self.label} #{self.id}")
+
+class MultiObjectTracker:
+    """Associates detections to tracks by IoU, falling back to centroid distance.
+
+    Costs for all track/detection pairs are computed as one NumPy matrix and
+    matched greedily from the cheapest pair. Frames without detections are
+    carried by a constant-velocity prediction, so no per-object OpenCV tracker
+    is needed.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_distance=TRACK_MAX_DISTANCE, max_missed=TRACK_MAX_MISSED):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.tracks = []
+        self.next_id = 1
+
+    def predict(self):
+        """Advance every track by its velocity (used on frames where detection is skipped)."""
+        if not self.tracks:
+            return
+        boxes = np.stack([track.box for track in self.tracks])
+        velocities = np.stack([track.velocity for track in self.tracks])
+        boxes += velocities
+        for track, box in zip(self.tracks, boxes):
+            track.box = box
+            track.record_position()
+
+    def match(self, track_boxes, det_boxes):
+        """Greedy assignment on the combined cost matrix; returns (track_idx, det_idx) pairs."""
+        iou = iou_matrix(track_boxes, det_boxes)
+        distance = centroid_distance_matrix(track_boxes, det_boxes)
+        # IoU matches cost [0, 1); centroid-only matches cost [1, 2); everything else is invalid
+        cost = np.where(iou >= self.iou_threshold, 1.0 - iou,
+                        np.where(distance < self.max_distance, 1.0 + distance / self.max_distance, np.inf))
+        rows, cols = np.nonzero(np.isfinite(cost))
+        order = np.argsort(cost[rows, cols], kind="stable")
+        used_tracks, used_dets, pairs = set(), set(), []
+        for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+            if r in used_tracks or c in used_dets:
+                continue
+            used_tracks.add(r)
+            used_dets.add(c)
+            pairs.append((r, c))
+            if len(used_tracks) == len(track_boxes) or len(used_dets) == len(det_boxes):
+                break
+        return pairs
+
+    def update(self, boxes, labels):
+        """Associate this frame's (N, 4) x1, y1, x2, y2 boxes and labels with tracks."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        matched_tracks, matched_dets = set(), set()
+        if self.tracks and len(boxes):
+            track_boxes = np.stack([track.box for track in self.tracks])
+            for t, d in self.match(track_boxes, boxes):
+                track = self.tracks[t]
+                track.velocity = boxes[d] - track.box
+                track.box = boxes[d].copy()
+                track.label = labels[d]
+                track.misses = 0
+                track.hits += 1
+                track.record_position()
+                matched_tracks.add(t)
+                matched_dets.add(d)
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+                track.box = track.box + track.velocity
+                track.record_position()
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_missed]
+
+        for d in range(len(boxes)):
+            if d not in matched_dets:
+                self.tracks.append(Track(self.next_id, boxes[d], labels[d]))
+                self.next_id += 1
+        return self.tracks
+
+    def reset(self):
+        self.tracks = []
@@ -1,26 +1,42 @@
 import tkinter as tk
-from tkinter import messagebox, Canvas, ttk, scrolledtext
+from tkinter import Canvas, ttk, scrolledtext
 import cv2
-import threading
 from PIL import Image, ImageTk
-from src.utilities import correct_distortion
-from src.video_processor import VideoProcessor
-from config.config import OUTPUT_DIR, CAMERA_SOURCES, BOUNDARY_Y, BOUNDARY_COLOR, MIN_AREA, THRESHOLD
+from src.event_store import get_event_store, playback_path
+from src.playback import ClipPlayer
+from src.pipeline import ProcessingPipeline
+from src.metrics import startup_clock
+from config.config import OUTPUT_DIR, PLAYBACK_PREROLL_SECONDS, RECORDINGS_LIST_LIMIT, DISPLAY_FPS, PROCESSING_FPS, \
+    DISPLAY_SIZE, ALERT_DISPLAY_SECONDS
+import io
 import logging
 import os
+import sqlite3
+import time
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class UserInterface:
-    def __init__(self, camera_manager):
+    """Tk front end. Processing runs on a ProcessingPipeline thread; the UI only
+    draws the newest result, at `display_fps`, from a single display loop."""
+
+    def __init__(self, camera_manager, display_fps=DISPLAY_FPS, processing_fps=PROCESSING_FPS):
         self.camera_manager = camera_manager
+        self.pipeline = ProcessingPipeline(camera_manager, processing_fps)
         self.root = tk.Tk()
         self.root.title("Smart Security Camera System")
         self.root.geometry("1000x700")
         self.running = True
         self.monitoring = False
-        self.photo = None
+        self.display_period_ms = max(1, round(1000 / display_fps))
+        self.displayed_seq = 0  # Sequence number of the result on screen
+        self.display_job = None
+        self.alert_job = None
+        self.status_updated_at = 0.0
+        self.reported_milestones = set()  # Startup milestones already written to the log panel
+        self.browser = None  # Recording browser window
+        self.player = None
 
         self.main_frame = ttk.Frame(self.root)
         self.main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -28,8 +44,13 @@ class UserInterface:
         self.left_frame = ttk.Frame(self.main_frame)
         self.left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        self.canvas = Canvas(self.left_frame, width=700, height=500, bg='black')
+        self.canvas = Canvas(self.left_frame, width=DISPLAY_SIZE[0], height=DISPLAY_SIZE[1], bg='black')
         self.canvas.pack(pady=10)
+        # One image item and one PhotoImage, updated in place every frame
+        self.photo = ImageTk.PhotoImage("RGB", DISPLAY_SIZE)
+        self.canvas_image = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
+        self.alert_label = ttk.Label(self.left_frame, text="", font=("Arial", 12, "bold"), foreground="red")
+        self.alert_label.pack()
 
         self.control_frame = ttk.Frame(self.left_frame)
         self.control_frame.pack(fill=tk.X, pady=5)
@@ -62,11 +83,11 @@ class UserInterface:
         self.settings_frame.pack(fill=tk.X, pady=5)
         
         ttk.Label(self.settings_frame, text="Boundary Y:").pack(side=tk.LEFT)
-        self.boundary_y_var = tk.IntVar(value=BOUNDARY_Y)
+        self.boundary_y_var = tk.IntVar(value=camera_manager.settings.boundary_y)
         ttk.Entry(self.settings_frame, textvariable=self.boundary_y_var, width=5).pack(side=tk.LEFT, padx=5)
         
         ttk.Label(self.settings_frame, text="Min Area:").pack(side=tk.LEFT)
-        self.min_area_var = tk.IntVar(value=MIN_AREA)
+        self.min_area_var = tk.IntVar(value=camera_manager.settings.min_area)
         ttk.Entry(self.settings_frame, textvariable=self.min_area_var, width=5).pack(side=tk.LEFT, padx=5)
         
         ttk.Button(self.settings_frame, text="Apply", command=self.apply_settings).pack(side=tk.LEFT)
@@ -78,13 +99,24 @@ class UserInterface:
         self.log_text.pack(fill=tk.BOTH, pady=5)
 
         self.update_camera_status()
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+        self.schedule_display()
 
     def update_camera_status(self):
+        """Show each camera's capture health; refreshed about once a second by the display loop."""
+        self.status_updated_at = time.monotonic()
         self.status_text.configure(state='normal')
         self.status_text.delete(1.0, tk.END)
-        for i, source in enumerate(CAMERA_SOURCES):
-            status = "Active" if self.camera_manager.processors[i].cap.isOpened() else "Inactive"
+        for i, health in enumerate(self.camera_manager.camera_health()):
+            state = health["capture_state"]
+            status = "Active" if state == "online" else state.capitalize()
+            if health.get("capture_retry_in_s") is not None and state in ("connecting", "reconnecting"):
+                status += f" (retry in {health['capture_retry_in_s']:.0f}s)"
+            if health.get("capture_reconnects"):
+                status += f", {health['capture_reconnects']} reconnects"
             self.status_text.insert(tk.END, f"Camera {i+1}: {status}\n")
+            if state != "online" and health.get("capture_error"):
+                self.status_text.insert(tk.END, f"  {health['capture_error']}\n")
         self.status_text.configure(state='disabled')
 
     def log_motion_event(self, event):
@@ -94,124 +126,201 @@ class UserInterface:
         self.log_text.see(tk.END)
         self.log_text.configure(state='disabled')
 
+    def show_alert(self, message):
+        """Show a non-blocking alert under the live view for ALERT_DISPLAY_SECONDS."""
+        self.alert_label.configure(text=message)
+        if self.alert_job is not None:
+            self.root.after_cancel(self.alert_job)
+        self.alert_job = self.root.after(int(ALERT_DISPLAY_SECONDS * 1000), self.clear_alert)
+
+    def clear_alert(self):
+        self.alert_job = None
+        self.alert_label.configure(text="")
+
     def start_monitoring(self):
+        # Also resumes after a pause; the display loop keeps running either way
         if not self.monitoring:
             self.monitoring = True
-            self.start_button.configure(state=tk.DISABLED)
+            self.pipeline.start()
+            self.start_button.configure(text="Start Monitoring", state=tk.DISABLED)
             self.pause_button.configure(state=tk.NORMAL)
             self.snapshot_button.configure(state=tk.NORMAL)
-            threading.Thread(target=self.update_feed, daemon=True).start()
 
     def pause_monitoring(self):
         if self.monitoring:
             self.monitoring = False
+            self.pipeline.pause()
             self.start_button.configure(text="Resume Monitoring", state=tk.NORMAL)
             self.pause_button.configure(state=tk.DISABLED)
             self.snapshot_button.configure(state=tk.DISABLED)
-        else:
-            self.monitoring = True
-            self.start_button.configure(text="Start Monitoring", state=tk.DISABLED)
-            self.pause_button.configure(state=tk.NORMAL)
-            self.snapshot_button.configure(state=tk.NORMAL)
-            threading.Thread(target=self.update_feed, daemon=True).start()
 
     def save_snapshot(self):
-        frame, _, _, annotations = self.camera_manager.process_feeds()
-        if frame is not None:
-            # Draw annotations on snapshot
-            for (x, y, w, h, label) in annotations:
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        """Save the annotated frame currently on screen."""
+        result = self.pipeline.latest()
+        if result is not None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             snapshot_path = os.path.join(OUTPUT_DIR, f"snapshot_{timestamp}.jpg")
-            cv2.imwrite(snapshot_path, frame)
-            messagebox.showinfo("Snapshot Saved", f"Snapshot saved to {snapshot_path}")
+            cv2.imwrite(snapshot_path, result.frame)
+            self.log_motion_event(f"Snapshot saved to {snapshot_path}")
         else:
-            messagebox.showerror("Error", "Failed to capture snapshot")
+            self.log_motion_event("Failed to capture snapshot: no frame yet")
 
     def review_recordings(self):
+        """Open the recording browser: indexed events newest first, with thumbnails and seek-to-event playback."""
+        if self.browser is not None and self.browser.winfo_exists():
+            self.browser.lift()
+            return
         try:
-            videos = [f for f in os.listdir(OUTPUT_DIR) if f.endswith(('.avi', '.mp4'))]
-            if not videos:
-                messagebox.showinfo("Info", "No recordings found.")
-                return
-            video_path = os.path.join(OUTPUT_DIR, videos[-1])
-            logging.info(f"Playing video: {video_path}")
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                messagebox.showerror("Error", f"Failed to open video: {video_path}")
-                return
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                cv2.imshow("Recording Playback", frame)
-                if cv2.waitKey(25) & 0xFF == ord('q'):
-                    break
-            cap.release()
-            cv2.destroyAllWindows()
-        except Exception as e:
+            self.recordings = get_event_store().query(limit=RECORDINGS_LIST_LIMIT)
+        except sqlite3.Error as e:
             logging.error(f"Error in review_recordings: {e}")
-            messagebox.showerror("Error", f"Failed to play recording: {e}")
+            self.log_motion_event(f"Failed to load recordings: {e}")
+            return
+        if not self.recordings:
+            self.log_motion_event("No recordings found.")
+            return
+
+        self.browser = tk.Toplevel(self.root)
+        self.browser.title("Recordings")
+        self.browser.protocol("WM_DELETE_WINDOW", self.close_browser)
+        list_frame = ttk.Frame(self.browser)
+        list_frame.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
+        self.recording_list = tk.Listbox(list_frame, width=45, height=20, exportselection=False)
+        self.recording_list.pack(fill=tk.Y, expand=True)
+        for event in self.recordings:
+            started = datetime.fromtimestamp(event["started_at"]).strftime("%Y-%m-%d %H:%M:%S")
+            direction = f" {event['direction']}" if event["direction"] else ""
+            self.recording_list.insert(tk.END, f"{started}  cam {event['camera'] + 1}{direction}  {event['labels']}")
+        self.recording_list.bind("<<ListboxSelect>>", lambda _: self.show_thumbnail())
+        self.recording_list.bind("<Double-Button-1>", lambda _: self.play_selected())
+        self.thumbnail_label = ttk.Label(list_frame)
+        self.thumbnail_label.pack(pady=5)
+        ttk.Button(list_frame, text="Play", command=self.play_selected).pack(pady=5)
+        self.playback_status = ttk.Label(list_frame, text="", foreground="red", wraplength=300)
+        self.playback_status.pack(pady=5)
+
+        self.playback_canvas = Canvas(self.browser, width=640, height=480, bg='black')
+        self.playback_canvas.pack(side=tk.RIGHT, padx=5, pady=5)
+        self.playback_photo = ImageTk.PhotoImage("RGB", (640, 480))
+        self.playback_image = self.playback_canvas.create_image(0, 0, anchor=tk.NW, image=self.playback_photo)
+
+        # Start with the newest event
+        self.recording_list.selection_set(0)
+        self.show_thumbnail()
+        self.play_selected()
+
+    def selected_recording(self):
+        selection = self.recording_list.curselection()
+        return self.recordings[selection[0]] if selection else None
+
+    def show_thumbnail(self):
+        event = self.selected_recording()
+        data = get_event_store().thumbnail(event["id"]) if event is not None else None
+        if data:
+            self.thumbnail_photo = ImageTk.PhotoImage(image=Image.open(io.BytesIO(data)))
+            self.thumbnail_label.configure(image=self.thumbnail_photo)
+
+    def play_selected(self):
+        """Play the selected clip from shortly before its trigger; decoding runs on a background thread."""
+        event = self.selected_recording()
+        if event is None:
+            return
+        if self.player is not None:
+            self.player.stop()
+        start_frame = event["trigger_frame"] - int(PLAYBACK_PREROLL_SECONDS * event["fps"])
+        video_path = playback_path(event)
+        logging.info(f"Playing video: {video_path} from frame {max(start_frame, 0)}")
+        self.playback_status.configure(text="")
+        self.player = ClipPlayer(video_path, start_frame, event["fps"]).start()
+        self.poll_playback(self.player)
+
+    def poll_playback(self, player):
+        if player is not self.player or self.browser is None or not self.browser.winfo_exists():
+            return
+        frame = player.get_frame()
+        if frame is not None:
+            self.playback_photo.paste(self.to_image(frame, (640, 480)))
+        elif player.finished:
+            if player.error:
+                self.playback_status.configure(text=player.error)
+            return
+        self.root.after(10, self.poll_playback, player)
+
+    def close_browser(self):
+        if self.player is not None:
+            self.player.stop()
+            self.player = None
+        self.browser.destroy()
+        self.browser = None
 
     def apply_settings(self):
-        global BOUNDARY_Y, MIN_AREA
-        BOUNDARY_Y = self.boundary_y_var.get()
-        MIN_AREA = self.min_area_var.get()
-        logging.info(f"Updated BOUNDARY_Y to {BOUNDARY_Y}, MIN_AREA to {MIN_AREA}")
-        # Reinitialize processors with updated config
-        self.camera_manager.processors = [VideoProcessor(source) for source in CAMERA_SOURCES]
-
-    def update_feed(self):
-        def update():
-            if not self.running or not self.monitoring:
-                return
-            try:
-                frame, motion_detected, boundary_crossed, annotations = self.camera_manager.process_feeds()
-                if frame is None:
-                    logging.warning("No frame received from camera manager")
-                    self.root.after(10, update)
-                    return
-
-                logging.debug(f"Frame received, shape: {frame.shape}")
-                frame = correct_distortion(frame)
-
-                # Draw annotations (green boxes and labels) on the live feed
-                bottom_y = None
-                for (x, y, w, h, label) in annotations:
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                    cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                    bottom_y = y + h  # Track the last object's bottom_y
-
-                # Draw the boundary line on the frame
-                cv2.line(frame, (0, BOUNDARY_Y), (frame.shape[1], BOUNDARY_Y), BOUNDARY_COLOR, 2)
-
-                # Draw BOUNDARY_Y and bottom_y values for debugging
-                cv2.putText(frame, f"BOUNDARY_Y: {BOUNDARY_Y}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                if bottom_y is not None:
-                    cv2.putText(frame, f"Bottom Y: {bottom_y}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
-                img = img.resize((700, 500), Image.Resampling.LANCZOS)
-                self.photo = ImageTk.PhotoImage(image=img)
-                self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
-
-                if motion_detected:
-                    self.log_motion_event("Motion detected!")
-                if boundary_crossed:
-                    self.log_motion_event("Boundary crossed! Recording started.")
-                    messagebox.showinfo("Alert", "Boundary crossed! Recording started.")
-
-            except Exception as e:
-                logging.error(f"Error in update_feed: {e}")
-            self.root.after(10, update)
-
-        self.root.after(10, update)
+        # Processors, trackers and open devices are kept; the new values apply from the next frame
+        try:
+            self.camera_manager.apply_settings(boundary_y=self.boundary_y_var.get(), min_area=self.min_area_var.get())
+        except (tk.TclError, ValueError) as e:
+            logging.error(f"Invalid settings: {e}")
+            self.log_motion_event(f"Invalid settings: {e}")
+
+    @staticmethod
+    def to_image(frame, size):
+        """Downscale straight to `size` with INTER_AREA and convert to a PIL image."""
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def schedule_display(self):
+        """Queue the next display tick; there is never more than one pending."""
+        if self.running and self.display_job is None:
+            self.display_job = self.root.after(self.display_period_ms, self.update_display)
+
+    def update_display(self):
+        """Draw the newest processed frame, if it changed, and report queued events."""
+        self.display_job = None
+        if not self.running:
+            return
+        started = time.monotonic()
+        try:
+            result = self.pipeline.latest()
+            if result is not None and result.seq != self.displayed_seq:
+                self.displayed_seq = result.seq
+                self.photo.paste(self.to_image(result.frame, DISPLAY_SIZE))
+                startup_clock.mark("first_frame_shown")
+            if len(self.reported_milestones) < len(startup_clock.milestones):
+                self.report_startup()
+            for event in self.pipeline.drain_events():
+                self.report_event(event)
+            if started - self.status_updated_at >= 1.0:
+                self.update_camera_status()
+        except Exception as e:
+            logging.error(f"Error in update_display: {e}")
+        # Keep the tick rate steady regardless of how long drawing took
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        self.display_job = self.root.after(max(1, self.display_period_ms - elapsed_ms), self.update_display)
+
+    def report_startup(self):
+        for milestone, seconds in startup_clock.summary().items():
+            if milestone not in self.reported_milestones:
+                self.reported_milestones.add(milestone)
+                self.log_motion_event(f"Startup: {milestone.replace('_', ' ')} after {seconds:.2f}s")
+
+    def report_event(self, event):
+        camera = event.get("camera", 0) + 1
+        if event["type"] == "motion_started":
+            labels = ", ".join(event["labels"])
+            self.log_motion_event(f"Motion detected by camera {camera}" + (f": {labels}" if labels else ""))
+        elif event["type"] == "recording_started":
+            self.log_motion_event(f"Boundary crossed on camera {camera}! Recording started.")
+            self.show_alert(f"Boundary crossed on camera {camera}! Recording started.")
 
     def quit(self):
         self.running = False
         self.monitoring = False
+        if self.display_job is not None:
+            self.root.after_cancel(self.display_job)
+            self.display_job = None
+        if self.player is not None:
+            self.player.stop()
+        self.pipeline.stop()
         self.camera_manager.release()
         self.root.quit()
 
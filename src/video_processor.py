@@ -1,100 +1,280 @@
 import cv2
 import numpy as np
-import imutils
-import torch
-from config.config import MIN_AREA, THRESHOLD, FRAME_WIDTH, BOUNDARY_Y
+import time
+from config.config import FRAME_WIDTH, MOTION_GATING, MOTION_ROI, MOTION_ROI_PADDING, DETECT_INTERVAL, \
+    UNDISTORT_BEFORE_DETECTION
+from src.detector import get_shared_detector
+from src.calibration import get_undistorter
+from src.tracker import MultiObjectTracker
+from src.metrics import StageTimer
+from src.runtime_config import get_runtime_config
+from src.zones import ZoneEngine, zones_for_camera
+from src.adaptive import AdaptiveController
+from src.capture import ResilientCapture
 import logging
-from collections import deque
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def resize_to_width(frame, width):
+    """Resize to `width` keeping the aspect ratio (what imutils.resize did, without the import)."""
+    h, w = frame.shape[:2]
+    return cv2.resize(frame, (width, int(h * width / float(w))), interpolation=cv2.INTER_AREA)
+
 class VideoProcessor:
-    def __init__(self, source):
+    def __init__(self, source, detector=None, camera_index=0, settings=None, frame_budget=None):
         logging.info(f"Initializing VideoProcessor with source: {source}")
-        self.cap = cv2.VideoCapture(source)
-        if not self.cap.isOpened():
-            logging.error(f"Failed to open video source: {source}")
-            raise ValueError(f"Failed to open video source: {source}")
+        # Never raises: a source that fails to open is retried in the background of read()
+        self.cap = ResilientCapture.from_source(source, name=f"camera {camera_index}")
+        self.settings = settings if settings is not None else get_runtime_config()  # Read on every frame
+        self.undistorter = get_undistorter(camera_index) if UNDISTORT_BEFORE_DETECTION else None
         self.fgbg = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=30, detectShadows=False)
-        self.model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
-        try:
-            self.tracker = cv2.TrackerCSRT_create()
-        except AttributeError:
-            logging.error("OpenCV tracking module not available. Install opencv-contrib-python.")
-            raise AttributeError("OpenCV tracking module not available. Install opencv-contrib-python.")
+        self.detector = detector if detector is not None else get_shared_detector()
+        self.detector.register()
+        self.tracker = MultiObjectTracker()
+        self.zones = ZoneEngine(zones_for_camera(camera_index), self.settings)
         self.tracking = False
-        self.bbox = None
-        self.recent_y = deque(maxlen=5)  # Store last 5 bottom_y values
-        self.last_y = None  # Store the previous bottom_y for consecutive frame comparison
+        self.motion_seen = False  # MOG2 found moving contours in the latest frame
+        self.objects_detected = False  # The most recent detection found tracked classes
+        self.last_events = []  # Zone crossings, entries and exits found by the most recent analyze() call
+        self._class_filter = (None, None, None)  # (classes, names, class IDs) the filter was built for
+        self.timer = StageTimer()
+        # Quality ladder driven by processing time; None keeps full quality
+        self.adaptive = AdaptiveController(frame_budget, camera_index=camera_index) if frame_budget else None
+        self.detect_scale = 1.0  # Detection input pixels -> frame pixels
+        self.frames_skipped = 0
+        self._skip_count = 0
+
+        # Motion gating counters
+        self.frames_seen = 0
+        self.detections_run = 0
+        self.frames_since_detection = 0
+        self.started_at = time.monotonic()
 
     def process_frame(self, frame):
-        logging.debug("Processing frame")
-        frame = imutils.resize(frame, width=FRAME_WIDTH)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        start = time.perf_counter()
+        frame, region = self.prepare(frame)
+        detections = None
+        if region is not None and self.detector.is_ready:
+            with self.timer.stage("detection"):
+                detections = self.detector.detect(self.detection_input(frame, region), self.detect_size)
+        result = self.analyze(frame, region, detections)
+        self.observe_processing(time.perf_counter() - start)
+        return result
+
+    def accept_frame(self):
+        """False for captured frames the adaptive controller drops to shed load."""
+        if self.adaptive is None or self.adaptive.skip <= 1:
+            return True
+        self._skip_count = (self._skip_count + 1) % self.adaptive.skip
+        if self._skip_count:
+            self.frames_skipped += 1
+            return False
+        return True
+
+    def observe_processing(self, seconds):
+        """Feed one frame's processing time to the adaptive controller."""
+        if self.adaptive is not None and self.adaptive.observe(seconds):
+            self.detector.request_tier(self, self.adaptive.model_tier)
+
+    def prepare(self, frame):
+        """Resize the frame and run background subtraction.
+
+        Returns the frame and the (x, y, w, h) region detection should run on, or
+        None when motion gating decides detection can be skipped for this frame.
+        """
+        with self.timer.stage("resize"):
+            frame = resize_to_width(frame, FRAME_WIDTH)
+        if self.undistorter is not None:
+            # Boxes and boundary checks are then computed in corrected space
+            with self.timer.stage("undistort"):
+                frame = self.undistorter.undistort(frame)
+        with self.timer.stage("blur"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            gray = cv2.GaussianBlur(gray, (21, 21), 0)
+
+        with self.timer.stage("mog2"):
+            fgmask = self.fgbg.apply(gray)
+            thresh = cv2.threshold(fgmask, self.settings.threshold, 255, cv2.THRESH_BINARY)[1]
+            thresh = cv2.dilate(thresh, None, iterations=2)
+            contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return frame, self.detection_region(frame, contours)
+
+    def detection_region(self, frame, contours):
+        """Decide whether detection runs on this frame and on which part of it."""
+        self.frames_seen += 1
+        self.frames_since_detection += 1
+        self.motion_seen = False
+        h, w = frame.shape[:2]
+
+        if self.tracking:
+            # The tracker carries the frames between periodic detections
+            if self.frames_since_detection < DETECT_INTERVAL:
+                return None
+            return (0, 0, w, h)
+
+        min_area = self.settings.min_area
+        moving = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_area]
+        self.motion_seen = bool(moving)
+        if MOTION_GATING and not moving:
+            return None
+        if MOTION_ROI and moving:
+            boxes = np.array(moving)
+            x1 = max(0, int(boxes[:, 0].min()) - MOTION_ROI_PADDING)
+            y1 = max(0, int(boxes[:, 1].min()) - MOTION_ROI_PADDING)
+            x2 = min(w, int((boxes[:, 0] + boxes[:, 2]).max()) + MOTION_ROI_PADDING)
+            y2 = min(h, int((boxes[:, 1] + boxes[:, 3]).max()) + MOTION_ROI_PADDING)
+            return (x1, y1, x2 - x1, y2 - y1)
+        return (0, 0, w, h)
+
+    @staticmethod
+    def crop(frame, region):
+        x, y, w, h = region
+        return frame[y:y + h, x:x + w]
+
+    @property
+    def detect_size(self):
+        """Model input size for this camera's frames; None uses the detector's default."""
+        return self.adaptive.detect_width if self.adaptive is not None else None
 
-        fgmask = self.fgbg.apply(gray)
-        thresh = cv2.threshold(fgmask, THRESHOLD, 255, cv2.THRESH_BINARY)[1]
-        thresh = cv2.dilate(thresh, None, iterations=2)
+    def detection_input(self, frame, region):
+        """The crop handed to the detector, downscaled when the adaptive level asks for a narrower input.
 
-        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        Boxes are scaled back by `detect_scale`, so tracks and zones stay in frame coordinates.
+        The model itself must also be run at `detect_size`, or it would scale the crop back up.
+        """
+        crop = self.crop(frame, region)
+        width = self.detect_size
+        if width and crop.shape[1] > width:
+            self.detect_scale = crop.shape[1] / width
+            height = max(1, round(crop.shape[0] / self.detect_scale))
+            with self.timer.stage("resize"):
+                return cv2.resize(crop, (width, height), interpolation=cv2.INTER_AREA)
+        self.detect_scale = 1.0
+        return crop
+
+    def class_ids(self):
+        """Detector class IDs whose labels are in the class filter, rebuilt only when the filter changes."""
+        classes, names = self.settings.classes, self.detector.names
+        if self._class_filter[0] is not classes or self._class_filter[1] is not names:
+            items = names.items() if isinstance(names, dict) else enumerate(names)
+            ids = np.array([int(cls) for cls, name in items if name.capitalize() in classes], dtype=np.int64)
+            self._class_filter = (classes, names, ids)
+        return self._class_filter[2]
+
+    def filter_detections(self, detections, region):
+        """Keep confident detections of tracked classes, as frame-space boxes and labels.
+
+        The confidence and class tests are one NumPy mask over all rows; only the
+        kept rows are turned into label strings.
+        """
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        keep = (detections[:, 4] > self.settings.confidence) & np.isin(detections[:, 5].astype(np.int64), self.class_ids())
+        kept = detections[keep]
+        offset_x, offset_y = region[0], region[1]
+        boxes = kept[:, :4] * np.float32(self.detect_scale) + np.array([offset_x, offset_y, offset_x, offset_y],
+                                                                         dtype=np.float32)
+        names = self.detector.names
+        labels = [names[cls].capitalize() for cls in kept[:, 5].astype(np.int64).tolist()]
+        return boxes, labels
+
+    def analyze(self, frame, region, detections):
+        """Filter detections, update the tracker and test tracks against the camera's zones.
+
+        `detections` are rows of (x1, y1, x2, y2, conf, cls) relative to `region`,
+        or None when detection was skipped for this frame.
+        """
         motion_detected = False
         boundary_crossed = False
         annotations = []
+        start = time.perf_counter()
 
-        # YOLOv5 object detection
-        results = self.model(frame)
-        for *xyxy, conf, cls in results.xyxy[0]:
-            if conf > 0.5:
-                x, y, w, h = int(xyxy[0]), int(xyxy[1]), int(xyxy[2]-xyxy[0]), int(xyxy[3]-xyxy[1])
-                label = self.model.names[int(cls)].capitalize()
-                if label in ["Person", "Car", "Truck"]:
-                    motion_detected = True
-                    annotations.append((x, y, w, h, label))
-                    bottom_y = y + h
-                    logging.debug(f"Detected {label} at bottom_y={bottom_y}, BOUNDARY_Y={BOUNDARY_Y}")
-
-                    # Update recent_y and check for crossing
-                    self.recent_y.append(bottom_y)
-                    if self.last_y is not None:
-                        if (self.last_y < BOUNDARY_Y and bottom_y >= BOUNDARY_Y) or \
-                           (self.last_y > BOUNDARY_Y and bottom_y <= BOUNDARY_Y):
-                            boundary_crossed = True
-                            logging.info(f"Boundary crossed by detected object! last_y={self.last_y}, bottom_y={bottom_y}")
-                    self.last_y = bottom_y
-
-                    # Reinitialize tracker if not tracking or tracking failed
-                    if not self.tracking:
-                        self.bbox = (x, y, w, h)
-                        self.tracker.init(frame, self.bbox)
-                        self.tracking = True
+        if detections is None:
+            # Detection skipped: the tracker carries every object forward
+            self.tracker.predict()
+            if not self.detector.is_ready:
+                motion_detected = self.motion_seen  # Motion-only until the model has loaded
+            else:
+                # Frames between periodic detections keep the last detection's result while tracks live
+                motion_detected = self.objects_detected and bool(self.tracker.tracks)
+        else:
+            self.detections_run += 1
+            self.frames_since_detection = 0
+            # YOLOv5 object detection (rows of x1, y1, x2, y2, conf, cls)
+            boxes, labels = self.filter_detections(detections, region)
+            motion_detected = self.objects_detected = bool(labels)
+            self.tracker.update(boxes, labels)
 
-        if self.tracking:
-            success, self.bbox = self.tracker.update(frame)
-            if success:
-                (x, y, w, h) = [int(v) for v in self.bbox]
-                annotations.append((x, y, w, h, "Tracked Object"))
-                bottom_y = y + h
-                logging.debug(f"Tracked object at bottom_y={bottom_y}, BOUNDARY_Y={BOUNDARY_Y}")
-
-                # Update recent_y and check for crossing
-                self.recent_y.append(bottom_y)
-                if self.last_y is not None:
-                    if (self.last_y < BOUNDARY_Y and bottom_y >= BOUNDARY_Y) or \
-                       (self.last_y > BOUNDARY_Y and bottom_y <= BOUNDARY_Y):
-                        boundary_crossed = True
-                        logging.info(f"Boundary crossed by tracked object! last_y={self.last_y}, bottom_y={bottom_y}")
-                self.last_y = bottom_y
+        # Each track keeps its own previous position, so objects cannot mask each other's crossings
+        self.last_events = self.zones.update(self.tracker.tracks)
+        for event in self.last_events:
+            if event["type"] == "crossing":
+                logging.info(f"Boundary {event['zone']} crossed ({event['direction']}) by {event['label']} #{event['track']}")
             else:
-                self.tracking = False
-                self.last_y = None
-                logging.debug("Tracker lost object, awaiting new detection")
+                action = "entered" if event["type"] == "zone_enter" else "left"
+                logging.info(f"{event['label']} #{event['track']} {action} zone {event['zone']}")
+        boundary_crossed = self.zones.triggered(self.last_events)
 
-        # Log recent_y for debugging
-        if self.recent_y:
-            logging.debug(f"Recent Y values: {list(self.recent_y)}")
+        annotations = [track.annotation() for track in self.tracker.tracks]
+        self.tracking = bool(self.tracker.tracks)
+        self.timer.record("tracking", time.perf_counter() - start)
 
         return frame, motion_detected, boundary_crossed, annotations
 
+    def get_stats(self):
+        """Detector invocation rate and the share of frames that skipped detection."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        skipped = self.frames_seen - self.detections_run
+        stats = {
+            "frames": self.frames_seen,
+            "detections": self.detections_run,
+            "detections_per_sec": round(self.detections_run / elapsed, 2),
+            "skipped_ratio": round(skipped / self.frames_seen, 3) if self.frames_seen else 0.0,
+        }
+        if self.adaptive is not None:
+            stats.update(self.adaptive.get_stats(), frames_dropped=self.frames_skipped)
+        stats.update(self.cap.health())
+        return stats
+
     def release(self):
-        self.cap.release()
\ No newline at end of file
+        self.cap.release()
+        if self.adaptive is not None:
+            self.detector.request_tier(self, None)
+        self.detector.unregister()
+
+def process_batch(detector, items, timer=None):
+    """Process one frame from each of several cameras with a single batched detector pass.
+
+    `items` are (camera index, processor, frame) tuples. Returns (camera index, frame,
+    motion_detected, boundary_crossed, annotations, zone events) for each item.
+    """
+    prepared = []
+    for i, processor, frame in items:
+        start = time.perf_counter()
+        frame, region = processor.prepare(frame)
+        prepared.append((i, processor, frame, region, time.perf_counter() - start))
+
+    # One batched forward pass per model input size for every camera whose frame was not
+    # gated out (none while the model loads)
+    to_detect = {}
+    for i, processor, frame, region, _ in prepared:
+        if region is not None and detector.is_ready:
+            to_detect.setdefault(processor.detect_size, []).append((i, processor.detection_input(frame, region)))
+    start = time.perf_counter()
+    detections_by_camera = {}
+    for size, group in to_detect.items():
+        detections = detector.detect_batch([crop for _, crop in group], size)
+        detections_by_camera.update((i, dets) for (i, _), dets in zip(group, detections))
+    detection_time = time.perf_counter() - start
+    if timer is not None and to_detect:
+        timer.record("detection", detection_time)
+    # Each camera in the batch is charged an equal share of the forward pass
+    detection_share = detection_time / len(detections_by_camera) if detections_by_camera else 0.0
+
+    results = []
+    for i, processor, frame, region, elapsed in prepared:
+        start = time.perf_counter()
+        results.append((i,) + processor.analyze(frame, region, detections_by_camera.get(i)) +
+                       (processor.last_events,))
+        elapsed += time.perf_counter() - start
+        processor.observe_processing(elapsed + (detection_share if i in detections_by_camera else 0.0))
+    return results
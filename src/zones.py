@@ -0,0 +1,192 @@
+import numpy as np
+import logging
+from config.config import ZONES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Half-length of the default boundary line; it spans any frame width
+DEFAULT_LINE_EXTENT = 1e6
+
+class LineZone:
+    """A line segment that tracks cross.
+
+    `directions` names crossings onto the right-hand side of start -> end (below a
+    left-to-right line) and back, in that order.
+    """
+
+    def __init__(self, name, start, end, directions=("down", "up"), trigger=True):
+        self.name = name
+        self.start = tuple(float(v) for v in start)
+        self.end = tuple(float(v) for v in end)
+        self.directions = tuple(directions)
+        self.trigger = trigger
+
+class PolygonZone:
+    """A closed area that tracks enter and exit."""
+
+    def __init__(self, name, points, trigger=True):
+        if len(points) < 3:
+            raise ValueError(f"Polygon zone {name} needs at least 3 points")
+        self.name = name
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.trigger = trigger
+
+def zone_from_config(entry, index=0):
+    """Build a zone from a ZONES entry: {"type": "line"|"polygon", "points": [[x, y], ...], ...}."""
+    kind = entry.get("type", "line")
+    name = entry.get("name", f"{kind}{index}")
+    trigger = entry.get("trigger", True)
+    if kind == "line":
+        start, end = entry["points"]
+        return LineZone(name, start, end, entry.get("directions", ("down", "up")), trigger)
+    if kind == "polygon":
+        return PolygonZone(name, entry["points"], trigger)
+    raise ValueError(f"Unknown zone type: {kind}")
+
+def zones_for_camera(camera_index):
+    """Configured zones for a camera, or None to use the default boundary line."""
+    entries = ZONES.get(camera_index)
+    if not entries:
+        return None
+    return [zone_from_config(entry, n) for n, entry in enumerate(entries)]
+
+def line_sides(points, starts, ends):
+    """(T, L) cross products: > 0 right of start -> end, < 0 left, 0 on the line."""
+    d = ends - starts
+    rel = points[:, None, :] - starts[None, :, :]
+    return d[None, :, 0] * rel[..., 1] - d[None, :, 1] * rel[..., 0]
+
+def segment_crossings(previous, current, starts, ends):
+    """(T, L) masks of moves previous -> current that cross each line onto its right and left side.
+
+    A move that ends exactly on a line counts as crossing it; one that starts on
+    it does not, so a track resting on the line is not counted twice.
+    """
+    before = line_sides(previous, starts, ends)
+    after = line_sides(current, starts, ends)
+    # The move must hit the segment itself, not only the line through it
+    motion = current - previous
+    to_start = starts[None, :, :] - previous[:, None, :]
+    to_end = ends[None, :, :] - previous[:, None, :]
+    side_start = motion[:, None, 0] * to_start[..., 1] - motion[:, None, 1] * to_start[..., 0]
+    side_end = motion[:, None, 0] * to_end[..., 1] - motion[:, None, 1] * to_end[..., 0]
+    within = side_start * side_end <= 0
+    return (before < 0) & (after >= 0) & within, (before > 0) & (after <= 0) & within
+
+def points_in_polygons(points, edges, offsets):
+    """(T, P) even-odd point-in-polygon test against every polygon at once.
+
+    `edges` is (E, 4) of x1, y1, x2, y2 for all polygons concatenated and `offsets`
+    the index of each polygon's first edge.
+    """
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    straddles = (y1 > y) != (y2 > y)
+    dy = np.where(y2 != y1, y2 - y1, 1.0)
+    x_cross = x1 + (y - y1) * (x2 - x1) / dy
+    hits = (straddles & (x < x_cross)).astype(np.int32)
+    return np.add.reduceat(hits, offsets, axis=1) % 2 == 1
+
+class ZoneEngine:
+    """Tests every track against every line and polygon zone of one camera.
+
+    Tracks are represented by their bottom-centre point. Lines report "crossing"
+    events with a direction; polygons report "zone_enter" and "zone_exit". With no
+    configured zones a single horizontal line follows settings.boundary_y.
+
+    Coasting tracks (missed by the latest detection, so only extrapolated) are
+    held at their last confirmed point and cannot cross or enter anything until
+    they are matched again. A track that is dropped while inside a polygon
+    reports "zone_exit" when it disappears.
+    """
+
+    def __init__(self, zones=None, settings=None):
+        self.default_line = zones is None
+        self.settings = settings
+        zones = zones or []
+        self.lines = [zone for zone in zones if isinstance(zone, LineZone)]
+        self.polygons = [zone for zone in zones if isinstance(zone, PolygonZone)]
+        self.line_starts = np.array([zone.start for zone in self.lines], dtype=np.float64).reshape(-1, 2)
+        self.line_ends = np.array([zone.end for zone in self.lines], dtype=np.float64).reshape(-1, 2)
+        if self.polygons:
+            self.edges = np.concatenate([np.hstack((zone.points, np.roll(zone.points, -1, axis=0)))
+                                         for zone in self.polygons])
+            self.offsets = np.cumsum([0] + [len(zone.points) for zone in self.polygons[:-1]])
+        self.triggers = {zone.name: zone.trigger for zone in zones} if zones else {"boundary": True}
+        self.reset()
+
+    def _line_arrays(self):
+        if not self.default_line:
+            return self.lines, self.line_starts, self.line_ends
+        y = float(self.settings.boundary_y)
+        line = LineZone("boundary", (-DEFAULT_LINE_EXTENT, y), (DEFAULT_LINE_EXTENT, y))
+        return [line], np.array([line.start]), np.array([line.end])
+
+    def _dropped_exits(self, ids):
+        """zone_exit events for previous tracks missing from `ids` that were inside a polygon."""
+        if not self.polygons or not len(self.previous_ids):
+            return []
+        gone = ~np.isin(self.previous_ids, ids)
+        return [{"type": "zone_exit", "zone": self.polygons[p].name, "track": int(self.previous_ids[t]),
+                 "label": self.previous_labels[t]}
+                for t, p in zip(*np.nonzero(self.previous_inside & gone[:, None]))]
+
+    def update(self, tracks):
+        """Test the tracks' new positions; returns event dicts in track order, then exits of dropped tracks."""
+        if not tracks:
+            events = self._dropped_exits(np.zeros(0, dtype=np.int64))
+            self.reset()
+            return events
+        ids = np.fromiter((track.id for track in tracks), dtype=np.int64, count=len(tracks))
+        boxes = np.array([track.box for track in tracks], dtype=np.float64)
+        anchors = np.stack(((boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]), axis=1)
+        confirmed = np.fromiter((track.misses == 0 for track in tracks), dtype=bool, count=len(tracks))
+
+        # Look up each track's state from the previous call; new tracks have a NaN
+        # previous point (NaN compares false, so they cannot cross yet) and are outside every polygon
+        previous = np.full_like(anchors, np.nan)
+        was_inside = np.zeros((len(tracks), len(self.polygons)), dtype=bool)
+        if len(self.previous_ids):
+            positions = np.minimum(np.searchsorted(self.previous_ids, ids), len(self.previous_ids) - 1)
+            known = self.previous_ids[positions] == ids
+            previous[known] = self.previous_anchors[positions[known]]
+            was_inside[known] = self.previous_inside[positions[known]]
+
+        # A coasting track stays where it was last seen
+        anchors = np.where(confirmed[:, None], anchors, previous)
+
+        events = []
+        lines, starts, ends = self._line_arrays()
+        if lines:
+            forward, backward = segment_crossings(previous, anchors, starts, ends)
+            for t, l in zip(*np.nonzero(forward | backward)):
+                zone = lines[l]
+                events.append({"type": "crossing", "zone": zone.name, "track": tracks[t].id, "label": tracks[t].label,
+                               "direction": zone.directions[0 if forward[t, l] else 1]})
+
+        inside = was_inside
+        if self.polygons:
+            inside = points_in_polygons(anchors, self.edges, self.offsets)
+            inside[~confirmed] = was_inside[~confirmed]
+            for t, p in zip(*np.nonzero(inside != was_inside)):
+                zone = self.polygons[p]
+                events.append({"type": "zone_enter" if inside[t, p] else "zone_exit", "zone": zone.name,
+                               "track": tracks[t].id, "label": tracks[t].label})
+
+        events += self._dropped_exits(ids)
+        # Only current tracks are kept, so dropped tracks are forgotten here
+        order = np.argsort(ids)
+        self.previous_ids, self.previous_anchors, self.previous_inside = ids[order], anchors[order], inside[order]
+        self.previous_labels = [tracks[t].label for t in order.tolist()]
+        return events
+
+    def triggered(self, events):
+        """True if any crossing or entry happened in a zone that starts a recording."""
+        return any(event["type"] != "zone_exit" and self.triggers.get(event["zone"], False) for event in events)
+
+    def reset(self):
+        # Sorted track IDs with their last anchor point, polygon membership and label
+        self.previous_ids = np.zeros(0, dtype=np.int64)
+        self.previous_labels = []
+        self.previous_anchors = np.zeros((0, 2))
+        self.previous_inside = np.zeros((0, len(self.polygons)), dtype=bool)
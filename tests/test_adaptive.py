@@ -0,0 +1,72 @@
+import pytest
+import src.adaptive as adaptive
+from src.adaptive import AdaptiveController
+from src.detector import Detector, StubBackend
+from src.runtime_config import RuntimeConfig
+from src.sources import SyntheticSource
+from src.video_processor import VideoProcessor
+
+LEVELS = [{"skip": 1}, {"skip": 1, "detect_width": 320}, {"skip": 2, "detect_width": 320, "model": 1}]
+BUDGET = 0.1
+SLOW, FAST, FAIR = 0.2, 0.05, 0.08  # Over budget, under the restore ratio (0.6), and in between
+
+@pytest.fixture
+def controller():
+    # alpha=1 makes the average the latest sample, so each test controls it exactly
+    return AdaptiveController(BUDGET, levels=LEVELS, alpha=1.0, hold_frames=5)
+
+def observe(controller, seconds, frames):
+    """Observe `frames` samples; returns the indices (0-based) of the ones that changed the level."""
+    return [n for n in range(frames) if controller.observe(seconds)]
+
+def test_steps_down_after_the_hold_when_over_budget(controller):
+    assert observe(controller, SLOW, 5) == [4]
+    assert controller.level == 1
+    assert (controller.detect_width, controller.skip, controller.model_tier) == (320, 1, 0)
+
+def test_level_is_held_before_the_next_change(controller):
+    assert observe(controller, SLOW, 12) == [4, 9]
+    assert controller.level == 2
+    assert observe(controller, SLOW, 10) == []  # Already the cheapest level
+
+def test_skipping_frames_raises_the_allowed_time(controller):
+    observe(controller, SLOW, 10)
+    assert controller.skip == 2
+    assert observe(controller, 0.15, 20) == []  # Within 2 frames' budget, not cheap enough to restore
+
+def test_steps_up_only_below_the_restore_ratio(controller):
+    observe(controller, SLOW, 5)
+    assert observe(controller, FAIR, 20) == []
+    assert observe(controller, FAST, 5) == [0]  # The hold has long passed
+    assert controller.level == 0
+
+def test_fast_frames_within_the_hold_do_not_restore(controller):
+    observe(controller, SLOW, 5)
+    assert observe(controller, FAST, 5) == [4]
+
+def test_restores_that_do_not_last_double_the_hold(controller, monkeypatch):
+    monkeypatch.setattr(adaptive, "ADAPTIVE_MAX_HOLD_FRAMES", 20)
+    observe(controller, SLOW, 5)
+    holds = []
+    for _ in range(4):
+        observe(controller, FAST, controller.restore_hold)  # Restore to level 0...
+        assert controller.level == 0
+        observe(controller, SLOW, 5)  # ...which cannot keep up
+        assert controller.level == 1
+        holds.append(controller.restore_hold)
+    assert holds == [10, 20, 20, 20]
+    # A level 0 that holds up resets the hold
+    observe(controller, FAST, controller.restore_hold)
+    observe(controller, FAST, 4 * controller.restore_hold)
+    assert controller.restore_hold == 5
+
+def test_accept_frame_drops_all_but_every_skip_th_frame():
+    detector = Detector(StubBackend(), warmup=False)
+    processor = VideoProcessor(SyntheticSource(64, 48), detector, settings=RuntimeConfig(), frame_budget=BUDGET)
+    try:
+        assert all(processor.accept_frame() for _ in range(5))  # Full quality keeps every frame
+        processor.adaptive = AdaptiveController(BUDGET, levels=[{"skip": 3}])
+        assert [processor.accept_frame() for _ in range(9)] == [False, False, True] * 3
+        assert processor.frames_skipped == 6
+    finally:
+        processor.release()
@@ -0,0 +1,14 @@
+from src.camera_manager import MotionHold
+
+def test_short_gaps_do_not_stop_motion():
+    hold = MotionHold(hold=1.0)
+    flags = [True, False, True, False, False, True] + [False] * 30
+    transitions = [(n, hold.update(flag, n * 0.1)) for n, flag in enumerate(flags)]
+    assert [t for t in transitions if t[1]] == [(0, "motion_started"), (15, "motion_stopped")]
+
+def test_motion_can_restart_after_stopping():
+    hold = MotionHold(hold=0.5)
+    assert hold.update(True, 0.0) == "motion_started"
+    assert hold.update(False, 0.6) == "motion_stopped"
+    assert hold.update(False, 0.7) is None
+    assert hold.update(True, 0.8) == "motion_started"
@@ -0,0 +1,90 @@
+import time
+import cv2
+import numpy as np
+import pytest
+from src.capture import ResilientCapture
+from src.sources import SyntheticSource, FlakySource, ReplaySource
+
+def read_for(capture, seconds):
+    """Read repeatedly for `seconds`; returns the number of frames and the states seen."""
+    frames, states = 0, set()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        ret, _ = capture.read()
+        frames += ret
+        states.add(capture.health()["capture_state"])
+        time.sleep(0.002)
+    return frames, states
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(5):
+        writer.write(np.full((48, 64, 3), i * 40, dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_reconnects_after_outage():
+    source = FlakySource(SyntheticSource(64, 48), fail_after=10, outage=0.3, drops=1)
+    capture = ResilientCapture(source, "flaky", max_failures=2, backoff=0.05, max_backoff=0.1)
+    frames, states = read_for(capture, 1.0)
+    health = capture.health()
+    assert {"online", "reconnecting"} <= states
+    assert health["capture_state"] == "online"
+    assert health["capture_reconnects"] == 1
+    assert frames > 10
+
+def test_reads_return_immediately_while_down():
+    source = FlakySource(SyntheticSource(64, 48), fail_after=0, outage=10.0)
+    capture = ResilientCapture(source, "down", max_failures=1, backoff=5.0)
+    capture.read()  # Fails and schedules a reconnect
+    start = time.monotonic()
+    for _ in range(100):
+        assert capture.read() == (False, None)
+    assert time.monotonic() - start < 0.1
+    assert 0 < capture.retry_delay() <= 5.0
+    assert capture.health()["capture_state"] == "reconnecting"
+
+def test_slow_failed_read_reconnects_at_once():
+    source = FlakySource(SyntheticSource(64, 48), fail_after=3, outage=10.0, stall=0.1)
+    capture = ResilientCapture(source, "stall", read_timeout=0.05, max_failures=100, backoff=5.0)
+    for _ in range(3):
+        assert capture.read()[0]
+    capture.read()  # Starts the outage
+    capture.read()  # Stalls past read_timeout
+    health = capture.health()
+    assert health["capture_state"] == "reconnecting"
+    assert health["capture_stalls"] == 1
+    assert "timed out" in health["capture_error"]
+
+def test_failing_factory_never_raises():
+    def unreachable():
+        raise ConnectionError("no route to camera")
+
+    capture = ResilientCapture(unreachable, "unreachable", backoff=0.01)
+    assert not capture.isOpened()
+    assert capture.read() == (False, None)
+    health = capture.health()
+    assert health["capture_state"] == "connecting"
+    assert "no route to camera" in health["capture_error"]
+
+def test_file_source_ends_instead_of_reconnecting(video_file):
+    capture = ResilientCapture(video_file, "file", max_failures=2)
+    frames = sum(capture.read()[0] for _ in range(20))
+    health = capture.health()
+    assert frames == 5
+    assert health["capture_state"] == "ended"
+    assert health["capture_retry_in_s"] is None
+    assert capture.retry_delay() is None
+
+def test_replay_source_loops(video_file):
+    capture = ResilientCapture(ReplaySource(video_file), "replay")
+    assert all(capture.read()[0] for _ in range(12))
+    assert capture.health()["capture_state"] == "online"
+
+def test_dict_source_carries_options(video_file):
+    capture = ResilientCapture.from_source({"source": video_file, "max_failures": 1, "read_timeout": 2.0})
+    assert capture.max_failures == 1
+    assert capture.read_timeout == 2.0
+    assert capture.isOpened()
@@ -0,0 +1,27 @@
+import os
+import numpy as np
+from src.clip_writer import ClipWriter, shutdown_compression_pool
+
+def test_unopenable_codec_falls_back_to_avi(tmp_path):
+    written = []
+    path, fallback = str(tmp_path / "clip.mp4"), str(tmp_path / "raw" / "clip.avi")
+    writer = ClipWriter(path, (64, 48), 10.0, "ZZZZ", "test", fallback_path=fallback,
+                        on_written=lambda w: written.append((w.path, w.frames_written)))
+    for _ in range(5):
+        writer.write(np.zeros((48, 64, 3), np.uint8), [])
+    writer.close()
+    writer.join(timeout=10.0)
+    shutdown_compression_pool(wait=True)
+    assert written == [(fallback, 5)]
+    assert os.path.getsize(fallback) > 0
+    assert writer.compress_to == path  # Compression still produces the requested file
+
+def test_unopenable_clip_without_fallback_drops_frames(tmp_path):
+    written = []
+    writer = ClipWriter(str(tmp_path / "clip.mp4"), (64, 48), 10.0, "ZZZZ", "test", on_written=written.append)
+    for _ in range(3):
+        writer.write(np.zeros((48, 64, 3), np.uint8), [])
+    writer.close()
+    writer.join(timeout=10.0)
+    assert written == []
+    assert writer.frames_dropped == 3
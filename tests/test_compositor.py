@@ -0,0 +1,30 @@
+import numpy as np
+from src.compositor import GridCompositor
+from src.pipeline import draw_overlay, map_points
+from src.zones import PolygonZone
+
+def test_grid_tiles_map_camera_points_like_annotations():
+    compositor = GridCompositor(2, columns=2, tile_size=(200, 150))
+    frames = [np.zeros((300, 400, 3), np.uint8), np.zeros((150, 100, 3), np.uint8)]
+    canvas, annotations = compositor.compose(frames, [[], [(10, 20, 30, 40, "Person")]], [0, 1])
+    assert set(compositor.tiles) == {0, 1}
+    matrix, size = compositor.tiles[1]
+    assert size == (100, 150)
+    assert map_points([(10, 20)], matrix).tolist() == [list(annotations[0][:2])]
+    assert map_points([(400, 300)], compositor.tiles[0][0]).tolist() == [[200, 150]]
+
+def test_boundary_line_is_drawn_within_each_tile():
+    compositor = GridCompositor(2, columns=2, tile_size=(200, 150))
+    frames = [np.zeros((300, 400, 3), np.uint8), np.zeros((150, 200, 3), np.uint8)]
+    canvas, _ = compositor.compose(frames, [[], []], [0, 1])
+    canvas = canvas.copy()
+    draw_overlay(canvas, [], 100, compositor.tiles)
+    # Camera 0 is scaled by 0.5 (line at y=50), camera 1 is unscaled (line at y=100)
+    assert canvas[50, 100].any() and not canvas[50, 300].any()
+    assert canvas[100, 300].any() and not canvas[100, 100].any()
+
+def test_configured_zones_replace_the_default_line():
+    frame = np.zeros((200, 200, 3), np.uint8)
+    draw_overlay(frame, [], 100, zones={0: [PolygonZone("yard", [(20, 150), (180, 150), (180, 190)])]})
+    assert frame[150, 100].any()
+    assert not frame[100, 190].any()
@@ -0,0 +1,41 @@
+import threading
+import time
+import numpy as np
+from src.detector import Detector, StubBackend
+
+class RecordingBackend(StubBackend):
+    """Stub backend that remembers the batch sizes and input sizes it was run with."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def infer(self, frames, size=None):
+        self.calls.append((len(frames), size))
+        return super().infer(frames, size)
+
+def detect_concurrently(detector, sizes):
+    threads = [threading.Thread(target=detector.detect, args=(np.zeros((10, 10, 3), np.uint8), size))
+               for size in sizes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5.0)
+
+def test_concurrent_requests_are_batched_per_input_size():
+    backend = RecordingBackend()
+    detector = Detector(backend, max_batch_size=4, batch_timeout=0.5, warmup=False)
+    detector.set_callers(4)
+    detect_concurrently(detector, [None, 320, None, 320])
+    assert sorted(backend.calls, key=str) == [(2, 320), (2, None)]
+
+def test_batch_waits_for_callers_not_cameras():
+    backend = RecordingBackend()
+    detector = Detector(backend, batch_timeout=5.0, warmup=False)
+    for _ in range(6):
+        detector.register()
+    detector.set_callers(2)  # Six cameras served by two worker threads
+    start = time.monotonic()
+    detect_concurrently(detector, [None, None])
+    assert backend.calls == [(2, None)]
+    assert time.monotonic() - start < 1.0
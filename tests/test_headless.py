@@ -0,0 +1,23 @@
+import io
+import json
+from src.headless import HeadlessRunner
+
+class FakeManager:
+    detector = None
+
+    def __init__(self):
+        self.processed = [0, 0]
+
+    def get_stats(self):
+        return [{"camera": i, "processed_frames": frames, "processed_fps": 0.0} for i, frames in enumerate(self.processed)]
+
+def test_processed_fps_covers_the_last_interval():
+    stream = io.StringIO()
+    manager = FakeManager()
+    runner = HeadlessRunner(manager, stream=stream)
+    manager.processed = [100, 10]
+    runner.emit_stats(0, 10.0)
+    manager.processed = [120, 10]
+    runner.emit_stats(0, 2.0)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [[c["processed_fps"] for c in line["cameras"]] for line in lines] == [[10.0, 1.0], [10.0, 0.0]]
@@ -0,0 +1,113 @@
+import json
+import re
+import urllib.request
+import pytest
+from src.metrics import Histogram, StageTimer, MetricsRegistry, MetricsServer
+
+SAMPLE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+def parse_exposition(text):
+    """Parse Prometheus text into ({metric: type}, [(name, labels, value)]), failing on malformed lines."""
+    types, samples = {}, []
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, metric, kind = line.split(" ")
+            assert metric not in types, f"{metric} declared twice"
+            types[metric] = kind
+        elif line.startswith("# HELP ") or not line:
+            continue
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"malformed sample: {line!r}"
+            labels = dict(re.findall(r'(\w+)="([^"]*)"', match["labels"] or ""))
+            samples.append((match["name"], labels, float(match["value"])))
+    return types, samples
+
+def test_quantiles_interpolate_within_buckets():
+    histogram = Histogram(buckets=range(1, 11))
+    for value in range(1, 101):
+        histogram.observe(value / 10)  # Uniform over (0, 10], ten samples per bucket
+    assert histogram.count == 100
+    assert histogram.sum == pytest.approx(505.0)
+    for q in (0.1, 0.25, 0.5, 0.9, 0.99):
+        assert histogram.quantile(q) == pytest.approx(q * 10, abs=1e-9)
+
+def test_quantile_of_default_buckets_is_within_one_bucket():
+    histogram = Histogram()
+    for _ in range(99):
+        histogram.observe(0.002)
+    histogram.observe(1.0)
+    assert 0.0016 <= histogram.quantile(0.5) <= 0.0032  # 2 ms falls in the (1.6, 3.2] ms bucket
+    assert histogram.quantile(1.0) > 0.8
+    assert Histogram().quantile(0.5) == 0.0
+
+def test_bucket_counts_are_cumulative_and_end_with_inf():
+    histogram = Histogram(buckets=(1, 2, 4))
+    for value in (0.5, 1, 1.5, 3, 3, 100):
+        histogram.observe(value)
+    buckets, total_sum, total = histogram.cumulative()
+    assert buckets == [(1, 2), (2, 3), (4, 5), (float("inf"), 6)]  # Upper bounds are inclusive
+    assert (total_sum, total) == (109.0, 6)
+
+def test_stage_timer_summary():
+    timer = StageTimer()
+    for seconds in (0.001, 0.002, 0.003):
+        timer.record("resize", seconds)
+    with timer.stage("blur"):
+        pass
+    summary = timer.summary()
+    assert set(summary) == {"resize", "blur"}
+    assert summary["resize"]["count"] == 3
+    assert summary["resize"]["total_ms"] == pytest.approx(6.0)
+    assert summary["resize"]["mean_ms"] == pytest.approx(2.0)
+
+def make_registry():
+    registry = MetricsRegistry()
+    timer = StageTimer()
+    timer.record("resize", 0.001)
+    timer.record("resize", 0.004)
+    registry.add_timer(timer, component="processor", camera=0)
+    age = Histogram()
+    age.observe(0.01)
+    registry.add_histogram("frame_age_seconds", age, camera=0)
+    registry.add_collector(lambda: [("camera_fps", {"camera": 1}, 12), ("camera_fps", {"camera": 0}, 15.5),
+                                    ("detector_ready", {}, True)])
+    return registry
+
+def test_prometheus_text_is_well_formed():
+    types, samples = parse_exposition(make_registry().render_prometheus())
+    assert types == {"ssc_stage_seconds": "histogram", "ssc_frame_age_seconds": "histogram",
+                     "ssc_camera_fps": "gauge", "ssc_detector_ready": "gauge"}
+
+    stage = [(labels, value) for name, labels, value in samples if name == "ssc_stage_seconds_bucket"]
+    assert all(labels["component"] == "processor" and labels["camera"] == "0" and labels["stage"] == "resize"
+               for labels, _ in stage)
+    counts = [value for _, value in stage]
+    assert counts == sorted(counts) and stage[-1][0]["le"] == "+Inf" and counts[-1] == 2
+    values = {(name, tuple(sorted(labels.items()))): value for name, labels, value in samples}
+    assert values[("ssc_stage_seconds_count", (("camera", "0"), ("component", "processor"), ("stage", "resize")))] == 2
+    assert values[("ssc_stage_seconds_sum", (("camera", "0"), ("component", "processor"), ("stage", "resize")))] == \
+        pytest.approx(0.005)
+    assert values[("ssc_camera_fps", (("camera", "1"),))] == 12.0
+    assert values[("ssc_detector_ready", ())] == 1.0
+
+    # Every sample follows its family's TYPE line and a family's samples are contiguous
+    families = [next(metric for metric in types if name in (metric, f"{metric}_bucket", f"{metric}_sum",
+                                                            f"{metric}_count")) for name, _, _ in samples]
+    runs = [family for n, family in enumerate(families) if n == 0 or families[n - 1] != family]
+    assert len(runs) == len(set(runs))
+
+def test_server_serves_metrics_and_snapshot():
+    server = MetricsServer(make_registry(), port=0)
+    server.start()
+    try:
+        host, port = server.server.server_address[:2]
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            parse_exposition(response.read().decode())
+        with urllib.request.urlopen(f"http://{host}:{port}/snapshot", timeout=5) as response:
+            snapshot = json.load(response)
+        assert snapshot["stages"][0]["stages"]["resize"]["count"] == 2
+    finally:
+        server.stop()
@@ -0,0 +1,129 @@
+import threading
+import numpy as np
+import pytest
+import src.recorder as recorder_module
+from src.event_store import EventStore
+from src.recorder import Recorder
+from src.runtime_config import RuntimeConfig
+
+FPS = 20.0
+CROSSING = [{"type": "crossing", "label": "Person", "zone": "boundary", "direction": "down"}]
+CAR_CROSSING = [{"type": "crossing", "label": "Car", "zone": "boundary", "direction": "up"}]
+
+class FakeWriter:
+    """Collects frames in memory in place of ClipWriter."""
+
+    def __init__(self, path, frame_size, fps, fourcc, timestamp, compress_to=None, timer=None, **callbacks):
+        self.path = path
+        self.fps = fps
+        self.frames = []
+        self.closed = False
+        self.frames_dropped = 0
+        self.thread = threading.Thread()  # Never started, so it is not "alive"
+
+    def write(self, frame, annotations):
+        self.frames.append(frame_index(frame))
+
+    def close(self):
+        self.closed = True
+
+    def queue_depth(self):
+        return 0
+
+    def join(self):
+        pass
+
+def frame_index(frame):
+    return int(frame[0, 0, 0]) + 256 * int(frame[0, 0, 1])
+
+def make_frame(index):
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    frame[0, 0, 0], frame[0, 0, 1] = index % 256, index // 256
+    return frame
+
+@pytest.fixture
+def writers(monkeypatch):
+    created = []
+
+    def factory(*args, **kwargs):
+        writer = FakeWriter(*args, **kwargs)
+        created.append(writer)
+        return writer
+
+    monkeypatch.setattr(recorder_module, "ClipWriter", factory)
+    return created
+
+@pytest.fixture
+def store():
+    events = EventStore(":memory:")
+    yield events
+    events.close()
+
+@pytest.fixture
+def recorder(tmp_path, store, writers):
+    return Recorder(str(tmp_path), str(tmp_path), settings=RuntimeConfig(post_roll_seconds=1.0), events=store)
+
+def run(recorder, frames, triggers=None, active=()):
+    """Feed frames 0..frames-1; `triggers` maps frame index -> trigger events, `active` holds frames with detections."""
+    triggers = triggers or {}
+    outcomes = {}
+    for n in range(frames):
+        frame = make_frame(n)
+        recorder.add_to_buffer(frame, [])
+        recorder.measured_fps = FPS  # Clips are written at a fixed rate regardless of test speed
+        outcome = recorder.update(frame, [], active=n in active, trigger_events=triggers.get(n, ()))
+        if outcome:
+            outcomes[n] = outcome
+    return outcomes
+
+def test_no_clip_without_trigger(recorder, writers):
+    run(recorder, 200, active=range(50, 100))
+    assert writers == []
+    assert recorder.state == "idle"
+
+def test_clip_has_pre_roll_and_post_roll_after_trigger(recorder, writers):
+    outcomes = run(recorder, 300, {100: CROSSING})
+    assert outcomes == {100: "started"}
+    (writer,) = writers
+    assert writer.closed
+    # 3 s of pre-roll ending at the trigger, then 1 s of post-roll; pre-roll does not shorten it
+    assert writer.frames == list(range(41, 121))
+
+def test_detections_extend_post_roll(recorder, writers):
+    run(recorder, 300, {100: CROSSING}, active=range(100, 150))
+    assert writers[0].frames[-1] == 149 + 20
+
+def test_crossing_within_gap_continues_clip(recorder, writers, store):
+    outcomes = run(recorder, 400, {100: CROSSING, 140: CAR_CROSSING})
+    assert outcomes == {100: "started", 140: "merged"}
+    (writer,) = writers
+    # The frames held back while lingering are written, so the clip has no gap
+    assert writer.frames == list(range(41, 161))
+    (event,) = store.query()
+    assert event["labels"] == "Car,Person"
+
+def test_crossing_after_gap_starts_new_clip(recorder, writers, store):
+    outcomes = run(recorder, 400, {100: CROSSING, 250: CAR_CROSSING})
+    assert outcomes == {100: "started", 250: "started"}
+    assert [writer.frames[-1] for writer in writers] == [120, 270]
+    assert len(store.query()) == 2
+
+def test_crossing_while_recording_extends(recorder, writers):
+    outcomes = run(recorder, 300, {100: CROSSING, 110: CAR_CROSSING})
+    assert outcomes == {100: "started", 110: "extended"}
+    assert writers[0].frames[-1] == 130
+
+def test_clip_stops_at_max_length(recorder, writers, monkeypatch):
+    monkeypatch.setattr(recorder_module, "RECORDER_MAX_CLIP_SECONDS", 5.0)
+    run(recorder, 400, {100: CROSSING}, active=range(400))
+    (writer,) = writers
+    assert len(writer.frames) == 100
+    assert writer.closed
+
+def test_get_stats_does_not_drop_closed_writers(recorder, writers):
+    run(recorder, 300, {100: CROSSING, 250: CAR_CROSSING})
+    recorder.get_stats()
+    recorder.stop_recording()
+    # Writers are only pruned when a clip stops, so get_stats cannot lose one appended meanwhile
+    assert recorder.closed_writers[-1] is writers[-1]
+    assert recorder.get_stats()["writers_finishing"] == 0
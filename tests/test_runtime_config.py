@@ -0,0 +1,52 @@
+import json
+import os
+import pytest
+from src.runtime_config import RuntimeConfig, ConfigWatcher
+
+def test_update_parses_values_and_bumps_version():
+    config = RuntimeConfig()
+    changed = config.update(threshold="40", classes=["person", "car"], post_roll_seconds=2)
+    assert changed == {"threshold": 40, "classes": frozenset({"Person", "Car"}), "post_roll_seconds": 2.0}
+    assert config.version == 1
+    assert config.update(threshold=40) == {}  # Unchanged values do not bump the version
+    assert config.version == 1
+
+@pytest.mark.parametrize("changes", [
+    {"threshold": 300},
+    {"confidence": 1.5},
+    {"min_area": -1},
+    {"post_roll_seconds": "soon"},
+    {"boundary_y": None},
+    {"frame_rate": 30},
+])
+def test_invalid_or_unknown_settings_apply_nothing(changes):
+    config = RuntimeConfig()
+    before = config.values()
+    with pytest.raises(ValueError):
+        config.update(**{"min_area": 10, "threshold": 40, **changes})  # Valid changes are not applied either
+    assert config.values() == before
+    assert config.version == 0
+
+def write_settings(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))  # Distinct mtimes, however fast the test runs
+
+def test_watcher_applies_file_changes_and_keeps_settings_on_bad_files(tmp_path):
+    path = tmp_path / "settings.json"
+    config = RuntimeConfig()
+    watcher = ConfigWatcher(config, str(path))
+    assert not watcher.check()  # No file yet
+
+    write_settings(path, json.dumps({"boundary_y": 123, "confidence": 0.7}), 1_000_000_000)
+    assert watcher.check()
+    assert (config.boundary_y, config.confidence, config.version) == (123, 0.7, 1)
+    assert not watcher.check()  # Not modified since
+
+    for text in ["{not json", "[1, 2]", json.dumps({"threshold": 999}), json.dumps({"colour": "red"})]:
+        write_settings(path, text, watcher.last_mtime + 1_000_000_000)
+        assert watcher.check()
+        assert (config.boundary_y, config.confidence, config.version) == (123, 0.7, 1)
+
+    write_settings(path, json.dumps({"boundary_y": 200}), watcher.last_mtime + 1_000_000_000)
+    watcher.check()
+    assert (config.boundary_y, config.version) == (200, 2)
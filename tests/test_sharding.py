@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+import numpy as np
+import pytest
+from src.runtime_config import RuntimeConfig
+from src.sharding import SharedFrameRing, ShardPool, _put_until_stopped
+from src.sources import SyntheticSource
+
+def test_blocked_put_gives_up_when_stopped():
+    results, stop = queue.Queue(maxsize=1), threading.Event()
+    results.put("full")
+    threading.Timer(0.2, stop.set).start()
+    start = time.monotonic()
+    assert not _put_until_stopped(results, "ring", stop, timeout=0.05)
+    assert time.monotonic() - start < 2.0
+
+def test_blocked_put_succeeds_once_drained():
+    results, stop = queue.Queue(maxsize=1), threading.Event()
+    results.put("full")
+    threading.Timer(0.1, results.get).start()
+    assert _put_until_stopped(results, "ring", stop, timeout=0.05)
+    assert results.get_nowait() == "ring"
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(4, 64 * 48 * 3)
+    yield ring
+    ring.close()
+
+def frame(value, shape=(48, 64, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+def test_ring_round_trip_through_an_attached_reader(ring):
+    reader = SharedFrameRing(4, ring.slot_bytes, ring.name)
+    try:
+        ring.write(0, frame(7))
+        ring.write(1, frame(9, (24, 32, 3)))
+        assert (reader.read(0, (48, 64, 3)) == 7).all()
+        assert (reader.read(1, (24, 32, 3)) == 9).all()
+    finally:
+        reader.close()
+    assert ring.read(0, (48, 64, 3)) is not None  # A reader closing does not unlink the block
+
+def test_ring_rejects_overwritten_and_torn_slots(ring):
+    ring.write(0, frame(1))
+    ring.write(4, frame(2))  # Same slot, newer sequence
+    assert ring.read(0, (48, 64, 3)) is None
+    assert (ring.read(4, (48, 64, 3)) == 2).all()
+    ring.headers[1] = 2 * 5 + 1  # Writer is half way through sequence 5
+    assert ring.read(5, (48, 64, 3)) is None
+
+def test_ring_refuses_frames_larger_than_a_slot(ring):
+    with pytest.raises(ValueError):
+        ring.write(0, frame(0, (49, 64, 3)))
+
+def collect_until(pool, condition, timeout=30.0):
+    """Collect results until `condition(frames by camera)` holds; returns the newest frame per camera."""
+    frames = {}
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not condition(frames):
+        pool.wait(0.1)
+        for i, frame, *_ in pool.collect():
+            frames[i] = frame
+    assert condition(frames)
+    return frames
+
+def test_shard_pool_grows_rings_and_recovers_from_a_dead_worker():
+    # Camera 0 is portrait, so its processed frames do not fit the initial slots
+    pool = ShardPool([SyntheticSource(480, 960), SyntheticSource(320, 240)], 1, RuntimeConfig(), "stub")
+    try:
+        frames = collect_until(pool, lambda frames: len(frames) == 2)
+        assert frames[0].shape == (1000, 500, 3) and frames[1].shape == (375, 500, 3)
+        assert pool.rings[0] is not pool.own_rings[0] and pool.rings[1] is pool.own_rings[1]
+
+        pool.workers[0].kill()
+        pool.workers[0].join()
+        received = list(pool.received)
+        collect_until(pool, lambda _: all(now > before + 5 for now, before in zip(pool.received, received)))
+        assert pool.restarts == [1]
+        assert pool.rings[0].slot_bytes >= 1000 * 500 * 3
+    finally:
+        pool.stop()
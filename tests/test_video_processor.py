@@ -0,0 +1,34 @@
+import pytest
+import src.video_processor as video_processor
+from src.detector import Detector, StubBackend
+from src.runtime_config import RuntimeConfig
+from src.sources import SyntheticSource, synthetic_detections
+from src.video_processor import VideoProcessor
+
+@pytest.fixture
+def processor():
+    detector = Detector(StubBackend(synthetic_detections), warmup=False)
+    processor = VideoProcessor(SyntheticSource(640, 480), detector, settings=RuntimeConfig())
+    yield processor
+    processor.release()
+
+def run_frames(processor, count):
+    flags = []
+    for _ in range(count):
+        _, frame = processor.cap.read()
+        flags.append(processor.process_frame(frame)[1])
+    return flags
+
+def test_motion_flag_is_steady_between_periodic_detections(processor, monkeypatch):
+    monkeypatch.setattr(video_processor, "DETECT_INTERVAL", 3)
+    flags = run_frames(processor, 60)
+    assert all(flags)
+    assert processor.detections_run <= 22  # Detection really was skipped on most frames
+
+def test_motion_flag_clears_without_tracks(processor):
+    run_frames(processor, 5)
+    processor.tracker.reset()
+    processor.objects_detected = False
+    _, frame = processor.cap.read()
+    frame, _ = processor.prepare(frame)
+    assert processor.analyze(frame, None, None)[1] is False
@@ -0,0 +1,70 @@
+import pytest
+from src.tracker import Track
+from src.zones import ZoneEngine, LineZone, PolygonZone
+from src.runtime_config import RuntimeConfig
+
+def track_at(track_id, x, bottom, label="Person", size=20):
+    """A track whose bottom-centre anchor is at (x, bottom)."""
+    return Track(track_id, [x - size / 2, bottom - size, x + size / 2, bottom], label)
+
+def feed(engine, positions):
+    """Update the engine once per frame; `positions` is a list of {track id: (x, bottom)}."""
+    events = []
+    for frame in positions:
+        events.append(engine.update([track_at(track_id, x, y) for track_id, (x, y) in frame.items()]))
+    return events
+
+def test_default_line_follows_boundary_y():
+    engine = ZoneEngine(settings=RuntimeConfig(boundary_y=100))
+    events = feed(engine, [{1: (50, 90)}, {1: (50, 110)}, {1: (50, 95)}])
+    assert events[0] == []
+    assert [(e["type"], e["zone"], e["direction"]) for e in events[1]] == [("crossing", "boundary", "down")]
+    assert events[2][0]["direction"] == "up"
+    assert engine.triggered(events[1])
+
+def test_new_track_cannot_cross_on_first_frame():
+    engine = ZoneEngine(settings=RuntimeConfig(boundary_y=100))
+    assert feed(engine, [{}, {7: (50, 150)}]) == [[], []]
+
+def test_segment_only_counts_within_its_ends():
+    engine = ZoneEngine([LineZone("door", (0, 100), (100, 100), directions=("in", "out"))])
+    events = feed(engine, [{1: (50, 90), 2: (200, 90)}, {1: (50, 110), 2: (200, 110)}])
+    assert [(e["track"], e["direction"]) for e in events[1]] == [(1, "in")]
+
+def test_polygon_enter_and_exit():
+    engine = ZoneEngine([PolygonZone("yard", [(0, 0), (100, 0), (100, 100), (0, 100)], trigger=False)])
+    events = feed(engine, [{1: (150, 50)}, {1: (50, 50)}, {1: (60, 50)}, {1: (150, 50)}])
+    assert [[e["type"] for e in frame] for frame in events] == [[], ["zone_enter"], [], ["zone_exit"]]
+    assert not engine.triggered(events[1])
+
+def test_tracks_are_independent():
+    engine = ZoneEngine(settings=RuntimeConfig(boundary_y=100))
+    events = feed(engine, [{1: (10, 90), 2: (80, 120)}, {2: (80, 130), 1: (10, 105)}])
+    assert [(e["track"], e["direction"]) for e in events[1]] == [(1, "down")]
+
+def test_polygon_needs_three_points():
+    with pytest.raises(ValueError):
+        PolygonZone("bad", [(0, 0), (1, 1)])
+
+def test_coasting_track_waits_for_a_confirmed_crossing():
+    engine = ZoneEngine(settings=RuntimeConfig(boundary_y=100))
+    engine.update([track_at(1, 50, 90)])
+    coasting = track_at(1, 50, 120)
+    coasting.misses = 1
+    assert engine.update([coasting]) == []
+    events = engine.update([track_at(1, 50, 125)])
+    assert [(e["track"], e["direction"]) for e in events] == [(1, "down")]
+
+def test_coasting_track_does_not_enter_polygon():
+    engine = ZoneEngine([PolygonZone("yard", [(0, 0), (100, 0), (100, 100), (0, 100)])])
+    engine.update([track_at(1, 150, 50)])
+    coasting = track_at(1, 50, 50)
+    coasting.misses = 2
+    assert engine.update([coasting]) == []
+
+def test_dropped_track_exits_polygon():
+    engine = ZoneEngine([PolygonZone("yard", [(0, 0), (100, 0), (100, 100), (0, 100)])])
+    feed(engine, [{1: (150, 50), 2: (150, 60)}, {1: (50, 50), 2: (60, 60)}])
+    events = feed(engine, [{2: (60, 60)}, {}])
+    assert [[(e["type"], e["track"], e["label"]) for e in frame] for frame in events] == \
+        [[("zone_exit", 1, "Person")], [("zone_exit", 2, "Person")]]